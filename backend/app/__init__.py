@@ -39,7 +39,14 @@ def create_app(config_class=Config):
         resources={
             r"/api/*": {
                 "origins": "*",
-                "allow_headers": ["Authorization", "Content-Type"]
+                "allow_headers": [
+                    "Authorization",
+                    "Content-Type",
+                    "X-Latitude",
+                    "X-Longitude",
+                    "X-Speed",
+                    "X-Location"
+                ]
             }
         }
     )
@@ -59,6 +66,13 @@ def create_app(config_class=Config):
     def expired_token(jwt_header, jwt_payload):
         return jsonify({"msg": "Token expired"}), 401
 
+    # ------------------------
+    # METRICS (PROMETHEUS)
+    # ------------------------
+    if app.config.get('METRICS_ENABLED'):
+        from app import metrics
+        metrics.init_app(app)
+
     # ------------------------
     # BLUEPRINTS
     # ------------------------
@@ -84,6 +98,24 @@ def create_app(config_class=Config):
     from app.dashcam import dashcam_bp
     app.register_blueprint(dashcam_bp)
 
+    # Background video analysis jobs (progress / cancel)
+    from app.api_video import video_bp
+    app.register_blueprint(video_bp)
 
+    # Long-lived dashcam streaming channel (WebSocket)
+    from app.dashcam_stream import sock
+    sock.init_app(app)
+
+    # ------------------------
+    # ML STACK (LAZY BY DEFAULT)
+    # ------------------------
+    if app.config.get('INFERENCE_PRELOAD'):
+        from app import ml_utils
+        ml_utils.load_model()
+
+    # Hot-swap of replaced weights (gunicorn starts it in post_fork instead)
+    if app.config.get('MODEL_WATCH_ON_START'):
+        from app import ml_utils
+        ml_utils.start_model_watcher()
 
     return app
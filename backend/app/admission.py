@@ -0,0 +1,229 @@
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt_identity
+
+
+# =====================================================
+# PER-CLIENT TOKEN BUCKET
+# =====================================================
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Consume one token. Returns 0.0, or seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+
+        return (1.0 - self.tokens) / self.rate
+
+
+# =====================================================
+# ADMISSION CONTROL / LOAD SHEDDING
+# =====================================================
+class AdmissionController:
+    """
+    Decides whether a detection request may enter the inference path.
+
+    A request is rejected (429) when:
+      - rate: its client (device / user) has used up its token bucket
+      - queue: `max_inflight` admitted requests are already in progress
+      - latency: p95 of recently completed requests exceeds `p95_limit_ms`
+        while work is still in flight
+    Admitted requests therefore see a bounded queue instead of every
+    client slowing down together.
+    """
+
+    def __init__(self, rate=5.0, burst=10, max_inflight=16, p95_limit_ms=1500,
+                 window_seconds=10.0, max_clients=5000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_inflight = int(max_inflight)
+        self.p95_limit = float(p95_limit_ms) / 1000.0
+        self.window = float(window_seconds)
+        self.max_clients = int(max_clients)
+
+        self._buckets = OrderedDict()
+        self._latencies = deque(maxlen=512)  # (finished_at, seconds)
+        self._lock = threading.Lock()
+
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = {"rate": 0, "queue": 0, "latency": 0}
+
+    # -------------------------
+    # Admission
+    # -------------------------
+    def admit(self, client_key):
+        """
+        Returns (admitted, reason, retry_after_seconds). Every admitted
+        request must be paired with `release()`.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(client_key)
+            if bucket is None:
+                bucket = self._buckets[client_key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(client_key)
+
+            if self.inflight >= self.max_inflight:
+                return self._reject("queue", self._expected_wait(now))
+
+            p95 = self._p95(now)
+            if self.inflight and p95 is not None and p95 > self.p95_limit:
+                return self._reject("latency", p95)
+
+            wait = bucket.take(now)
+            if wait:
+                return self._reject("rate", wait)
+
+            self.inflight += 1
+            self.admitted += 1
+
+            return True, None, 0.0
+
+    def release(self, started):
+        """Mark one admitted request finished (`started` = time.monotonic())."""
+        now = time.monotonic()
+
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
+            self._latencies.append((now, now - started))
+
+    def _reject(self, reason, retry_after):
+        self.rejected[reason] += 1
+        return False, reason, max(retry_after, 1.0 / self.rate)
+
+    # -------------------------
+    # Latency window
+    # -------------------------
+    def _recent(self, now):
+        while self._latencies and now - self._latencies[0][0] > self.window:
+            self._latencies.popleft()
+
+        return [lat for _, lat in self._latencies]
+
+    def _p95(self, now):
+        recent = self._recent(now)
+
+        if len(recent) < 5:
+            return None
+
+        recent.sort()
+        return recent[min(len(recent) - 1, int(math.ceil(0.95 * len(recent))) - 1)]
+
+    def _expected_wait(self, now):
+        recent = self._recent(now)
+
+        if not recent:
+            return 1.0
+
+        # A slot frees up roughly every mean request latency
+        return sum(recent) / len(recent)
+
+    def stats(self):
+        now = time.monotonic()
+
+        with self._lock:
+            p95 = self._p95(now)
+
+            return {
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "p95_limit_ms": round(self.p95_limit * 1000, 1),
+                "clients": len(self._buckets)
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission():
+    """Shared admission controller, or None if disabled."""
+    global _controller
+
+    cfg = current_app.config
+
+    if not cfg.get("ADMISSION_ENABLED", True):
+        return None
+
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    rate=cfg.get("ADMISSION_RATE_PER_SECOND", 5.0),
+                    burst=cfg.get("ADMISSION_BURST", 10),
+                    max_inflight=cfg.get("ADMISSION_MAX_INFLIGHT", 16),
+                    p95_limit_ms=cfg.get("ADMISSION_P95_LIMIT_MS", 1500),
+                    window_seconds=cfg.get("ADMISSION_LATENCY_WINDOW_SECONDS", 10)
+                )
+
+    return _controller
+
+
+def throttle_payload(reason, retry_after):
+    """JSON body for a shed request; clients pace frames by suggested_interval_ms."""
+    return {
+        "msg": "Server busy, slow down",
+        "reason": reason,
+        "retry_after": round(retry_after, 3),
+        "suggested_interval_ms": int(math.ceil(retry_after * 1000))
+    }
+
+
+def admission_controlled(endpoint):
+    """
+    Route decorator: run the view only if the caller (JWT identity) is
+    admitted, else return 429 with Retry-After. Place after @jwt_required().
+    """
+
+    def decorator(view):
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            controller = get_admission()
+
+            if controller is None:
+                return view(*args, **kwargs)
+
+            admitted, reason, retry_after = controller.admit(
+                (endpoint, get_jwt_identity())
+            )
+
+            if not admitted:
+                response = jsonify(throttle_payload(reason, retry_after))
+                response.status_code = 429
+                response.headers["Retry-After"] = str(max(1, int(math.ceil(retry_after))))
+                return response
+
+            started = time.monotonic()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release(started)
+
+        return wrapper
+
+    return decorator
@@ -3,14 +3,31 @@ from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from werkzeug.utils import secure_filename
 from app.models import DamageReport
 from app import db
-from app.utils import log_audit
-from app.ml_utils import detect_damage, detect_damage_with_image
+from app.utils import log_audit, report_image_name
+from app.admission import admission_controlled
+from app import metrics
+from app.video_jobs import submit_video_job
+from app.frame_io import (
+    read_frame_request,
+    read_image,
+    decode_b64_image,
+    read_response_mode
+)
+from app.ml_utils import (
+    detect_damage,
+    detect_damage_with_image,
+    check_frame_quality,
+    quality_stats,
+    cascade_enabled,
+    last_model_version
+)
 import os
+import re
 import cv2
-import numpy as np
-import base64
 import time
 
+MODEL_VERSION_RE = re.compile(r"^[0-9a-f]{1,32}$")
+
 citizen_bp = Blueprint('citizen', __name__, url_prefix='/api/citizen')
 
 
@@ -38,6 +55,7 @@ def ensure_citizen():
 # 🔍 DETECT ONLY (PREVIEW — NO DB SAVE)
 # =====================================================
 @citizen_bp.route('/detect', methods=['POST'])
+@admission_controlled("citizen_detect")
 def detect_only():
     if 'image' not in request.files:
         return jsonify({"msg": "No image"}), 400
@@ -56,12 +74,27 @@ def detect_only():
     path = os.path.join(temp_dir, filename)
     file.save(path)
 
-    damage, confidence, annotated_b64 = detect_damage_with_image(path)
+    # Decode phone photos at reduced resolution (model runs at 640)
+    frame = read_image(path, target_size=640)
+
+    if read_response_mode(request, current_app.config.get("RESPONSE_MODE_DEFAULT", "image")) == "boxes":
+        damage, confidence, boxes = detect_damage_with_image(frame, boxes_only=True)
+
+        return jsonify({
+            "damage_type": damage,
+            "confidence": confidence,
+            "boxes": boxes or [],
+            "annotated_image": None,
+            "model_version": last_model_version()
+        }), 200
+
+    damage, confidence, annotated_b64 = detect_damage_with_image(frame)
 
     return jsonify({
         "damage_type": damage,
         "confidence": confidence,
-        "annotated_image": annotated_b64
+        "annotated_image": annotated_b64,
+        "model_version": last_model_version()
     }), 200
 
 
@@ -69,30 +102,42 @@ def detect_only():
 # 📹 REALTIME FRAME DETECT (ULTRA FAST)
 # =====================================================
 @citizen_bp.route('/detect-frame', methods=['POST'])
+@admission_controlled("citizen_frame")
 def detect_frame():
     """
-    Accepts base64 webcam frame.
+    Accepts a webcam frame: raw image/jpeg body, multipart `frame`
+    part, or legacy base64 JSON.
     Runs detection in memory with optimized frame size.
+    ?mode=boxes returns normalised boxes instead of an annotated image.
     """
 
-    data = request.get_json()
-
-    if not data or 'frame' not in data:
-        return jsonify({"msg": "No frame provided"}), 400
-
     try:
-        frame_data = data['frame']
+        boxes_only = read_response_mode(
+            request,
+            current_app.config.get("RESPONSE_MODE_DEFAULT", "image")
+        ) == "boxes"
+
+        frame, _, error = read_frame_request(request, target_size=640)
 
-        if ',' in frame_data:
-            frame_data = frame_data.split(',')[1]
+        if frame is None:
+            return jsonify({"msg": error}), 400
 
-        frame_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(frame_bytes, np.uint8)
+        # --------------------------------------------------
+        # QUALITY GATE (blur / exposure / occlusion)
+        # --------------------------------------------------
 
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if current_app.config.get("QUALITY_GATE_ENABLED", True):
+            reasons = check_frame_quality(frame)
+            quality_stats.record(get_jwt_identity(), reasons)
 
-        if frame is None:
-            return jsonify({"msg": "Frame decode failed"}), 400
+            if reasons:
+                return jsonify({
+                    "damage_type": "Low Quality",
+                    "confidence": 0.0,
+                    "detected": False,
+                    "quality_reasons": reasons,
+                    "annotated_image": None
+                }), 200
 
         # --------------------------------------------------
         # ⚡ SPEED OPTIMIZATION
@@ -105,13 +150,18 @@ def detect_frame():
 
         if w > MAX_WIDTH:
             scale = MAX_WIDTH / w
-            frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
+            with metrics.stage("resize"):
+                frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
 
         # --------------------------------------------------
         # FAST DETECTION
         # --------------------------------------------------
 
-        damage, confidence, annotated_b64 = detect_damage_with_image(frame)
+        damage, confidence, annotation = detect_damage_with_image(
+            frame,
+            cascade=cascade_enabled("citizen_frame"),
+            boxes_only=boxes_only
+        )
 
         detected = damage not in (
             "No Damage",
@@ -119,6 +169,18 @@ def detect_frame():
             "Detection Error"
         )
 
+        if boxes_only:
+            return jsonify({
+                "damage_type": damage,
+                "confidence": round(float(confidence), 3),
+                "detected": detected,
+                "boxes": (annotation or []) if detected else [],
+                "annotated_image": None,
+                "model_version": last_model_version()
+            }), 200
+
+        annotated_b64 = annotation
+
         # --------------------------------------------------
         # Only send annotated image when damage detected
         # --------------------------------------------------
@@ -130,7 +192,8 @@ def detect_frame():
             "damage_type": damage,
             "confidence": round(float(confidence), 3),
             "detected": detected,
-            "annotated_image": annotated_b64
+            "annotated_image": annotated_b64,
+            "model_version": last_model_version()
         }), 200
 
     except Exception as e:
@@ -138,6 +201,59 @@ def detect_frame():
         return jsonify({"msg": str(e)}), 500
 
 
+# =====================================================
+# 🎥 VIDEO FILE DETECT (BACKGROUND JOB)
+# =====================================================
+@citizen_bp.route('/detect-video', methods=['POST'])
+def detect_video():
+    """
+    Accepts a video file upload and queues it for background analysis.
+    Returns a job id at once; poll /api/video/jobs/<job_id> for progress,
+    partial summary and the final result.
+    Optional form field `mode`: "keyframe" (default) or "full".
+    """
+    if 'video' not in request.files:
+        return jsonify({"msg": "No video file provided"}), 400
+
+    file = request.files['video']
+    if file.filename == '':
+        return jsonify({"msg": "Empty filename"}), 400
+
+    allowed_exts = current_app.config['VIDEO_ALLOWED_EXTENSIONS']
+    ext = file.filename.rsplit('.', 1)[-1].lower()
+    if ext not in allowed_exts:
+        return jsonify({"msg": "Invalid video format. Allowed: mp4, avi, mov, mkv"}), 400
+
+    user_id = get_jwt_identity()
+
+    video_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos')
+    os.makedirs(video_dir, exist_ok=True)
+
+    filename = secure_filename(f"{user_id}_{int(time.time())}.{ext}")
+    video_path = os.path.join(video_dir, filename)
+    file.save(video_path)
+
+    job_id = submit_video_job(
+        current_app.config,
+        user_id,
+        video_path,
+        meta={
+            "location": request.form.get('location'),
+            "latitude": request.form.get('latitude', type=float),
+            "longitude": request.form.get('longitude', type=float),
+            "mode": request.form.get('mode')
+        }
+    )
+
+    log_audit(user_id, f"VIDEO_JOB_QUEUED {job_id}")
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/video/jobs/{job_id}"
+    }), 202
+
+
 # =====================================================
 # 🎥 VIDEO FILE DETECT (FULL VIDEO — GPU BATCH INFERENCE)
 # =====================================================
@@ -290,6 +406,7 @@ def submit_realtime_frame():
     Accepts multipart/form-data:
       - frame_b64: base64 JPEG of the detected frame
       - damage_type, confidence, location, latitude, longitude, description
+      - model_version (from the detect-frame response)
     """
     user_id = get_jwt_identity()
 
@@ -297,6 +414,11 @@ def submit_realtime_frame():
     confidence  = request.form.get('confidence', 0.0, type=float)
     frame_b64   = request.form.get('frame_b64', '')
 
+    # Echoed back from the /detect-frame response that produced the frame
+    model_version = request.form.get('model_version') or None
+    if model_version and not MODEL_VERSION_RE.match(model_version):
+        model_version = None
+
     if not damage_type or damage_type == 'No Damage':
         return jsonify({"msg": "No damage detected — nothing to submit"}), 400
 
@@ -304,14 +426,13 @@ def submit_realtime_frame():
     img_filename = "REALTIME_NO_IMAGE"  # Fallback
     if frame_b64:
         try:
-            raw = frame_b64.split(',')[1] if ',' in frame_b64 else frame_b64
-            img_bytes = base64.b64decode(raw)
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Stored as evidence: decode at full resolution
+            img = decode_b64_image(frame_b64)
             if img is not None:
                 image_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'images')
                 os.makedirs(image_dir, exist_ok=True)
-                img_filename = f"rt_submit_{user_id}_{int(time.time())}.jpg"
+                # The browser sends the frame it drew the boxes on
+                img_filename = report_image_name(f"rt_submit_{user_id}_{int(time.time())}", True)
                 cv2.imwrite(os.path.join(image_dir, img_filename), img)
         except Exception as e:
             current_app.logger.warning(f"Could not save realtime frame image: {e}")
@@ -333,12 +454,13 @@ def submit_realtime_frame():
         longitude=request.form.get('longitude', type=float),
         detected_damage_type=damage_type,
         confidence_score=round(confidence, 3),
+        model_version=model_version,
         severity=severity,
         status="submitted"
     )
     db.session.add(report)
     db.session.commit()
-    log_audit(user_id, f"SUBMIT_REALTIME_REPORT {report.id}")
+    log_audit(user_id, f"SUBMIT_REALTIME_REPORT {report.id} model={model_version}")
 
     return jsonify({"msg": "Report submitted successfully", "report_id": report.id}), 201
 
@@ -375,6 +497,7 @@ def submit_report():
     # ML INFERENCE
     # -------------------------
     damage_type, confidence = detect_damage(file_path)
+    model_version = last_model_version()
 
     # -------------------------
     # SEVERITY LOGIC
@@ -400,6 +523,7 @@ def submit_report():
         longitude=request.form.get("longitude", type=float),
         detected_damage_type=damage_type,
         confidence_score=confidence,
+        model_version=model_version,
         severity=severity,
         status="submitted"
     )
@@ -412,7 +536,7 @@ def submit_report():
     # -------------------------
     log_audit(
         user_id,
-        f"SUBMIT_DAMAGE_REPORT {report.id}"
+        f"SUBMIT_DAMAGE_REPORT {report.id} model={model_version}"
     )
 
     return jsonify({
@@ -2,8 +2,10 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from app.models import DamageReport
 from app import db
-from app.utils import log_audit
-from flask import current_app
+from app.utils import log_audit, is_pre_annotated
+from flask import current_app, send_from_directory
+import os
+import threading
 
 
 official_bp = Blueprint('official', __name__, url_prefix='/api/official')
@@ -43,6 +45,7 @@ def get_all_reports():
             "longitude": r.longitude,
             "damage_type": r.detected_damage_type,
             "confidence": r.confidence_score,
+            "model_version": r.model_version,
             "severity": r.severity,
             "status": r.status,
             "report_source": r.report_source,
@@ -70,18 +73,55 @@ def get_report(report_id):
         "longitude": report.longitude,
         "damage_type": report.detected_damage_type,
         "confidence": report.confidence_score,
+        "model_version": report.model_version,
         "severity": report.severity,
         "status": report.status,
         "report_source": report.report_source,
         "created_at": report.created_at.isoformat(),
         "image_url": f"/api/files/images/{report.image_path}",
+        "annotated_url": f"/api/official/reports/{report.id}/annotated",
         "reported_by": "Citizen"  # replace later with user lookup
     }), 200
 
 
+# =====================================================
+# 🖼️ ANNOTATED IMAGE (RENDERED ON DEMAND)
+# =====================================================
+@official_bp.route('/reports/<report_id>/annotated', methods=['GET'])
+def get_annotated_image(report_id):
+    """
+    Boxes drawn on the stored report image. Rendered the first time an
+    official opens it and cached under uploads/images/annotated/.
+    Images stored already annotated (dashcam sessions) are served as is.
+    """
+    report = DamageReport.query.get(report_id)
+    if not report or not report.image_path:
+        return jsonify({"msg": "Image not found"}), 404
+
+    image_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'images')
+    annotated_dir = os.path.join(image_dir, 'annotated')
+
+    src = os.path.join(image_dir, report.image_path)
+    dst = os.path.join(annotated_dir, report.image_path)
+
+    if not os.path.exists(src):
+        return jsonify({"msg": "Image not found"}), 404
+
+    if is_pre_annotated(report.image_path):
+        return send_from_directory(image_dir, report.image_path)
+
+    fresh = os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src)
+
+    # Imported on demand: keeps the ML stack out of listing-only workers
+    from app.ml_utils import render_annotated_file
+
+    if not fresh and not render_annotated_file(src, dst, priority="interactive"):
+        return jsonify({"msg": "Annotation failed"}), 500
+
+    return send_from_directory(annotated_dir, report.image_path)
+
+
 from app.models import WorkReport
-from flask import send_from_directory, current_app
-import os
 
 # =====================================================
 # 📋 WORK NOTICES (PDF EXTRACTED DATA)
@@ -129,7 +169,6 @@ def download_work_report_pdf(report_id):
 
 from werkzeug.utils import secure_filename
 from app.models import WorkReport
-import pdfplumber
 import re
 
 @official_bp.route('/work-reports/upload', methods=['POST'])
@@ -153,6 +192,8 @@ def upload_work_notice():
     # 📄 REAL PDF EXTRACTION (FIXED FORMAT)
     # -------------------------------
     def extract_from_pdf(path):
+        import pdfplumber
+
         try:
             text = ""
             if not os.path.exists(path):
@@ -352,3 +393,60 @@ def get_analytics():
             {"sector": "S4", "index": 9.0, "status": "Excellent"}
         ]
     }), 200
+
+
+# =====================================================
+# 🧠 MODEL REGISTRY — ACTIVE VERSION / HOT SWAP
+# =====================================================
+@official_bp.route('/model', methods=['GET'])
+def get_model_info():
+    from app.ml_utils import model_info
+
+    return jsonify(model_info()), 200
+
+
+@official_bp.route('/model/reload', methods=['POST'])
+def reload_model():
+    """
+    Load new weights into a standby model in the background and swap it in
+    once warm; serving continues on the current model meanwhile.
+    Optional JSON `weights`: a file name inside model/ (default: the
+    active weights file, e.g. a replaced best.pt). The choice is published
+    to model/ACTIVE, so every other worker (and pool process) swaps to the
+    same weights on its next watcher poll.
+    """
+    from app import ml_utils
+
+    data = request.get_json(silent=True) or {}
+
+    if ml_utils.pool is not None and not data.get("weights"):
+        return jsonify({
+            "msg": "Inference runs in worker processes; replace model/best.pt and they swap automatically"
+        }), 409
+
+    if ml_utils.registry["swapping"]:
+        return jsonify({"msg": "A model swap is already in progress"}), 409
+
+    weights = None
+
+    if data.get("weights"):
+        weights = os.path.join(ml_utils.MODEL_DIR, secure_filename(data["weights"]))
+
+        if not os.path.isfile(weights):
+            return jsonify({"msg": "Weights file not found in model/"}), 404
+
+    if weights:
+        ml_utils.publish_active_weights(weights)
+
+    # Pool mode: the worker processes' watchers pick the change up
+    if ml_utils.pool is None:
+        threading.Thread(
+            target=ml_utils.swap_model,
+            args=(weights,),
+            name="model-swap",
+            daemon=True
+        ).start()
+
+    log_audit(get_jwt_identity(), f"MODEL_RELOAD {os.path.basename(weights) if weights else 'active'}")
+
+    return jsonify(dict(ml_utils.model_info(), msg="Model swap started")), 202
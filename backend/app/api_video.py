@@ -0,0 +1,273 @@
+import os
+import json
+import time
+from flask import Blueprint, jsonify, request, current_app, send_file
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from werkzeug.utils import secure_filename
+from app.video_jobs import get_job_store, job_to_dict, timeline_path_for, submit_video_job, FINAL_STATUSES
+from app.video_uploads import get_upload_store, write_chunk, remove_part, part_path, UploadError
+from app.utils import log_audit
+
+
+video_bp = Blueprint('video', __name__, url_prefix='/api/video')
+
+
+def _load_job(job_id):
+    """Job row if the caller owns it (officials see all), else an error response."""
+    job = get_job_store(current_app.config).get(job_id)
+
+    if not job:
+        return None, (jsonify({"msg": "Job not found"}), 404)
+
+    if get_jwt().get("role") != "official" and job["owner_id"] != str(get_jwt_identity()):
+        return None, (jsonify({"msg": "Access denied"}), 403)
+
+    return job, None
+
+
+# =====================================================
+# 📈 VIDEO JOB PROGRESS (POLLING)
+# =====================================================
+@video_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_video_job(job_id):
+    """
+    Progress of a background video analysis job:
+    frames processed / total, ETA, partial summary, final result.
+    """
+    job, error = _load_job(job_id)
+    if error:
+        return error
+
+    return jsonify(job_to_dict(job)), 200
+
+
+# =====================================================
+# 🎞️ VIDEO JOB TIMELINE (NDJSON)
+# =====================================================
+@video_bp.route('/jobs/<job_id>/timeline', methods=['GET'])
+@jwt_required()
+def get_video_job_timeline(job_id):
+    """Per-frame {frame, damage_type, confidence} lines, streamed from disk."""
+    job, error = _load_job(job_id)
+    if error:
+        return error
+
+    path = timeline_path_for(job)
+
+    if job["status"] != "done" or not os.path.exists(path):
+        return jsonify({"msg": "Timeline not available"}), 404
+
+    return send_file(path, mimetype="application/x-ndjson")
+
+
+# =====================================================
+# ⛔ CANCEL VIDEO JOB
+# =====================================================
+@video_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_video_job(job_id):
+    job, error = _load_job(job_id)
+    if error:
+        return error
+
+    if job["status"] in FINAL_STATUSES:
+        return jsonify({"msg": f"Job already {job['status']}"}), 409
+
+    store = get_job_store(current_app.config)
+    store.request_cancel(job_id)
+    log_audit(get_jwt_identity(), f"CANCEL_VIDEO_JOB {job_id}")
+
+    return jsonify(job_to_dict(store.get(job_id))), 202
+
+
+# =====================================================
+# ⏫ RESUMABLE CHUNKED UPLOAD (TUS-LIKE)
+# =====================================================
+# 1. POST   /uploads                 {filename, length, mode?, location?, latitude?, longitude?}
+# 2. PATCH  /uploads/<id>            body = raw bytes, headers Upload-Offset + Upload-Checksum
+# 3. HEAD   /uploads/<id>            after a dropped connection: resume from Upload-Offset
+# 4. POST   /uploads/<id>/finalize   queues the assembled video as an analysis job
+def _upload_headers(upload):
+    return {
+        "Upload-Offset": str(upload["offset_bytes"]),
+        "Upload-Length": str(upload["length"]),
+        "Cache-Control": "no-store"
+    }
+
+
+def _load_upload(upload_id):
+    """Upload row if the caller created it, else an error response."""
+    upload = get_upload_store(current_app.config).get(upload_id)
+
+    if not upload:
+        return None, (jsonify({"msg": "Upload not found"}), 404)
+
+    if upload["owner_id"] != str(get_jwt_identity()):
+        return None, (jsonify({"msg": "Access denied"}), 403)
+
+    return upload, None
+
+
+@video_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    data = request.get_json(silent=True) or {}
+
+    filename = data.get("filename") or ""
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ""
+
+    if ext not in current_app.config['VIDEO_ALLOWED_EXTENSIONS']:
+        return jsonify({"msg": "Invalid video format. Allowed: mp4, avi, mov, mkv"}), 400
+
+    try:
+        length = int(data.get("length"))
+    except (TypeError, ValueError):
+        return jsonify({"msg": "length (total bytes) is required"}), 400
+
+    if length <= 0 or length > current_app.config['VIDEO_UPLOAD_MAX_LENGTH']:
+        return jsonify({"msg": "Invalid upload length"}), 413
+
+    store = get_upload_store(current_app.config)
+    store.expire(current_app.config['VIDEO_UPLOAD_EXPIRY_HOURS'] * 3600)
+
+    user_id = get_jwt_identity()
+
+    video_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos')
+    os.makedirs(video_dir, exist_ok=True)
+
+    video_path = os.path.join(
+        video_dir,
+        secure_filename(f"{user_id}_{int(time.time())}_{os.urandom(4).hex()}.{ext}")
+    )
+
+    meta = {
+        "location": data.get("location"),
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "mode": data.get("mode")
+    }
+
+    upload_id = store.create(user_id, video_path, length, json.dumps(meta))
+    upload = store.get(upload_id)
+
+    return jsonify({
+        "upload_id": upload_id,
+        "upload_url": f"/api/video/uploads/{upload_id}",
+        "offset": 0,
+        "length": length,
+        "max_chunk_size": current_app.config['VIDEO_UPLOAD_CHUNK_MAX']
+    }), 201, dict(_upload_headers(upload), Location=f"/api/video/uploads/{upload_id}")
+
+
+@video_bp.route('/uploads/<upload_id>', methods=['HEAD'])
+@jwt_required()
+def upload_status(upload_id):
+    upload, error = _load_upload(upload_id)
+    if error:
+        return "", error[1]
+
+    return "", 200, _upload_headers(upload)
+
+
+@video_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """
+    Append one chunk at `Upload-Offset`. The body is streamed to disk
+    (never buffered whole) and committed only if `Upload-Checksum`
+    ("sha256 <base64>") matches; on 409 / 460 re-read the offset with
+    HEAD and resend from there.
+    """
+    upload, error = _load_upload(upload_id)
+    if error:
+        return error
+
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"msg": "Upload-Offset header required"}), 400
+
+    max_chunk = current_app.config['VIDEO_UPLOAD_CHUNK_MAX']
+
+    if request.content_length is not None and request.content_length > max_chunk:
+        return jsonify({"msg": f"Chunk larger than {max_chunk} bytes"}), 413
+
+    try:
+        new_offset = write_chunk(
+            get_upload_store(current_app.config),
+            upload,
+            offset,
+            request.stream,
+            request.headers.get("Upload-Checksum"),
+            max_chunk
+        )
+
+    except UploadError as e:
+        upload = get_upload_store(current_app.config).get(upload_id) or upload
+        return jsonify({"msg": e.msg, "offset": upload["offset_bytes"]}), e.status, _upload_headers(upload)
+
+    return "", 204, {"Upload-Offset": str(new_offset)}
+
+
+@video_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_upload(upload_id):
+    """Move the completed upload into place and queue it for analysis."""
+    upload, error = _load_upload(upload_id)
+    if error:
+        return error
+
+    store = get_upload_store(current_app.config)
+
+    # Idempotent: a retried finalize returns the same job
+    if upload["status"] == "finalized":
+        return jsonify({
+            "job_id": upload["job_id"],
+            "status_url": f"/api/video/jobs/{upload['job_id']}"
+        }), 202
+
+    if not store.begin_finalize(upload_id):
+        upload = store.get(upload_id)
+        return jsonify({
+            "msg": "Upload incomplete" if upload["status"] == "open" else "Upload is being finalized",
+            "offset": upload["offset_bytes"],
+            "length": upload["length"]
+        }), 409, _upload_headers(upload)
+
+    os.replace(part_path(upload["video_path"]), upload["video_path"])
+
+    user_id = get_jwt_identity()
+
+    job_id = submit_video_job(
+        current_app.config,
+        user_id,
+        upload["video_path"],
+        meta=json.loads(upload["meta"] or "{}")
+    )
+    store.mark_finalized(upload_id, job_id)
+
+    log_audit(user_id, f"VIDEO_JOB_QUEUED {job_id} (upload {upload_id})")
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/video/jobs/{job_id}"
+    }), 202
+
+
+@video_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(upload_id):
+    upload, error = _load_upload(upload_id)
+    if error:
+        return error
+
+    if upload["status"] != "open":
+        return jsonify({"msg": f"Upload already {upload['status']}"}), 409
+
+    store = get_upload_store(current_app.config)
+    store.delete(upload_id)
+    remove_part(upload["video_path"])
+
+    return "", 204
@@ -0,0 +1,305 @@
+import os
+import sys
+import glob
+import math
+import logging
+import threading
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SYS_CPU = "/sys/devices/system/cpu"
+SYS_NODE = "/sys/devices/system/node"
+
+
+# =====================================================
+# TOPOLOGY DETECTION (/sys, AFFINITY, CGROUP QUOTA)
+# =====================================================
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def parse_cpulist(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+
+    return cpus
+
+
+def allowed_cpus():
+    """Logical CPUs this process may run on (taskset / cpuset aware)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(os.cpu_count() or 1))
+
+
+def cgroup_cpu_limit():
+    """Whole CPUs granted by a cgroup v2 / v1 quota (containers), or None."""
+    text = _read("/sys/fs/cgroup/cpu.max")
+
+    if text:
+        quota, _, period = text.partition(" ")
+        if quota == "max":
+            return None
+        return max(1, math.ceil(int(quota) / int(period or 100000)))
+
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+    if quota and period and int(quota) > 0:
+        return max(1, math.ceil(int(quota) / int(period)))
+
+    return None
+
+
+def detect_topology():
+    """
+    Physical cores (with their SMT siblings) and NUMA nodes of the CPUs
+    this process may use. Without /sys (non-Linux) every logical CPU
+    counts as its own core on node 0.
+    """
+    cpus = allowed_cpus()
+
+    node_of = {}
+    for path in glob.glob(os.path.join(SYS_NODE, "node[0-9]*")):
+        node = int(os.path.basename(path)[4:])
+        for cpu in parse_cpulist(_read(os.path.join(path, "cpulist"))):
+            node_of[cpu] = node
+
+    cores = {}
+    for cpu in cpus:
+        base = os.path.join(SYS_CPU, f"cpu{cpu}", "topology")
+        package = _read(os.path.join(base, "physical_package_id"))
+        core = _read(os.path.join(base, "core_id"))
+
+        key = (
+            node_of.get(cpu, 0),
+            int(package) if package else 0,
+            int(core) if core else cpu
+        )
+        cores.setdefault(key, []).append(cpu)
+
+    # Sorted by node, package, core: neighbouring entries share a node
+    physical = [{"node": key[0], "cpus": sorted(cores[key])} for key in sorted(cores)]
+
+    return {
+        "logical_cpus": len(cpus),
+        "physical_cores": physical,
+        "numa_nodes": len({c["node"] for c in physical}) or 1,
+        "cgroup_cpu_limit": cgroup_cpu_limit()
+    }
+
+
+# =====================================================
+# PER-WORKER THREAD BUDGETS
+# =====================================================
+def plan_layout(workers, topology=None, use_smt=None, interop_threads=None):
+    """
+    Split the machine between `workers` inference processes.
+
+    Each worker gets a contiguous run of physical cores (so it stays on
+    one NUMA node when the split allows), pinned to those cores' logical
+    CPUs, with one intra-op thread per physical core (per logical CPU
+    with `use_smt`). With more workers than cores, workers share cores
+    round-robin with one thread each. A cgroup CPU quota caps the total.
+    """
+    topology = topology or detect_topology()
+    use_smt = Config.INFERENCE_USE_SMT if use_smt is None else use_smt
+    interop = int(interop_threads or Config.INFERENCE_INTEROP_THREADS)
+
+    cores = topology["physical_cores"] or [{"node": 0, "cpus": [0]}]
+    workers = max(1, int(workers))
+
+    layouts = []
+
+    if workers <= len(cores):
+        bounds = [round(i * len(cores) / workers) for i in range(workers + 1)]
+        groups = [cores[bounds[i]:bounds[i + 1]] for i in range(workers)]
+    else:
+        groups = [[cores[i % len(cores)]] for i in range(workers)]
+
+    quota = topology["cgroup_cpu_limit"]
+
+    for i, group in enumerate(groups):
+        cpus = sorted(c for core in group for c in core["cpus"])
+        threads = len(cpus) if use_smt else len(group)
+
+        if workers > len(cores):
+            threads = 1
+
+        if quota:
+            threads = min(threads, max(1, quota // workers))
+
+        layouts.append({
+            "worker": i,
+            "workers": workers,
+            "cpus": cpus,
+            "numa_nodes": sorted({core["node"] for core in group}),
+            "threads": max(1, threads),
+            "interop_threads": interop,
+            "cv2_threads": Config.INFERENCE_CV2_THREADS
+        })
+
+    return layouts
+
+
+# =====================================================
+# APPLY (AFFINITY + TORCH / OPENCV / ONNX RUNTIME)
+# =====================================================
+_layout = None
+_topology = None
+_apply_lock = threading.Lock()
+
+
+def apply_layout(layout, pin=None):
+    """
+    Pin this process to the layout's CPUs and size every thread pool
+    to its budget. Libraries imported later (torch is lazy) pick the
+    budget up from the environment and configure_libraries().
+    """
+    global _layout, _topology
+
+    pin = Config.INFERENCE_PIN_CPUS if pin is None else pin
+
+    with _apply_lock:
+        if _topology is None:
+            _topology = detect_topology()
+
+        if pin and hasattr(os, "sched_setaffinity") and layout["workers"] > 1:
+            try:
+                os.sched_setaffinity(0, layout["cpus"])
+            except OSError as e:
+                logger.warning(f"CPU pinning failed: {e}")
+
+        threads = str(layout["threads"])
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = threads
+
+        _layout = layout
+
+    configure_libraries()
+
+    logger.info(
+        f"CPU layout: worker {layout['worker'] + 1}/{layout['workers']} "
+        f"pid={os.getpid()} cpus={layout['cpus']} numa={layout['numa_nodes']} "
+        f"threads={layout['threads']} interop={layout['interop_threads']} "
+        f"cv2={layout['cv2_threads']} (machine: {_topology['logical_cpus']} logical / "
+        f"{len(_topology['physical_cores'])} physical, {_topology['numa_nodes']} NUMA node(s))"
+    )
+
+    return layout
+
+
+def apply_worker_layout(worker, workers):
+    """Plan for `workers` processes and apply slot `worker` (wraps around)."""
+    layouts = plan_layout(workers)
+    return apply_layout(layouts[worker % len(layouts)])
+
+
+def current_layout():
+    """Applied layout; a single process owning every allowed core by default."""
+    if _layout is None:
+        apply_layout(plan_layout(1))
+
+    return _layout
+
+
+def configure_libraries():
+    """Size torch / OpenCV pools for the current layout (if imported yet)."""
+    layout = _layout
+    if layout is None:
+        return
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(layout["threads"])
+
+        try:
+            # Only allowed before the first parallel region
+            torch.set_num_interop_threads(layout["interop_threads"])
+        except RuntimeError:
+            pass
+
+    cv2 = sys.modules.get("cv2")
+    if cv2 is not None:
+        cv2.setNumThreads(layout["cv2_threads"])
+
+
+def onnx_session_options():
+    import onnxruntime as ort
+
+    layout = current_layout()
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = layout["threads"]
+    options.inter_op_num_threads = layout["interop_threads"]
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    return options
+
+
+def tune_onnx_session(yolo_model, weights_path):
+    """
+    Ultralytics builds its ONNX Runtime session with default options (a
+    thread per core); rebuild it with this worker's budget. Call after
+    the first prediction, once the predictor exists.
+    """
+    backend = getattr(getattr(yolo_model, "predictor", None), "model", None)
+    session = getattr(backend, "session", None)
+
+    if session is None or not hasattr(session, "get_providers"):
+        return False
+
+    try:
+        import onnxruntime as ort
+
+        backend.session = ort.InferenceSession(
+            weights_path,
+            sess_options=onnx_session_options(),
+            providers=session.get_providers()
+        )
+        return True
+
+    except Exception as e:
+        logger.warning(f"Could not apply thread budget to the ONNX session: {e}")
+        return False
+
+
+def layout_stats():
+    """Chosen layout for /stats and metrics."""
+    if _layout is None:
+        return {"applied": False}
+
+    return {
+        "applied": True,
+        "pid": os.getpid(),
+        "worker": _layout["worker"],
+        "workers": _layout["workers"],
+        "cpus": _layout["cpus"],
+        "numa_nodes": _layout["numa_nodes"],
+        "threads": _layout["threads"],
+        "interop_threads": _layout["interop_threads"],
+        "cv2_threads": _layout["cv2_threads"],
+        "machine": {
+            "logical_cpus": _topology["logical_cpus"],
+            "physical_cores": len(_topology["physical_cores"]),
+            "numa_nodes": _topology["numa_nodes"],
+            "cgroup_cpu_limit": _topology["cgroup_cpu_limit"]
+        }
+    }
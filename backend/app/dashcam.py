@@ -1,14 +1,28 @@
 from flask import Blueprint, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-
-from app.ml_utils import detect_damage_with_frame
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+
+from app.ml_utils import (
+    detect_damage_with_frame,
+    check_frame_quality,
+    quality_stats,
+    cascade_enabled,
+    cascade_stats,
+    inference_queue_stats,
+    last_model_version,
+    model_info
+)
+from app.frame_cache import FrameResultCache, dhash
+from app.dashcam_gate import MotionGate
+from app.device_profiles import get_profile
+from app.frame_io import read_frame_request, decode_b64_image, read_response_mode
 from app import db
 from app.models import DamageReport
-from app.utils import log_audit
+from app.utils import log_audit, report_image_name
+from app.admission import admission_controlled, get_admission
+from app.cpu_topology import layout_stats
+from app import metrics
 
-import base64
 import cv2
-import numpy as np
 import os
 import time
 
@@ -19,86 +33,259 @@ dashcam_bp = Blueprint(
     url_prefix="/api/dashcam"
 )
 
+_frame_cache = None
+
+
+def get_frame_cache():
+    """Shared near-duplicate frame cache, or None if disabled."""
+    global _frame_cache
+
+    cfg = current_app.config
+
+    if not cfg.get("FRAME_CACHE_ENABLED", True):
+        return None
+
+    if _frame_cache is None:
+        _frame_cache = FrameResultCache(
+            ttl_seconds=cfg.get("FRAME_CACHE_TTL_SECONDS", 3.0),
+            max_distance=cfg.get("FRAME_CACHE_MAX_DISTANCE", 5),
+            max_entries=cfg.get("FRAME_CACHE_SIZE", 16)
+        )
+
+    return _frame_cache
+
+
+_motion_gate = None
+
+
+def get_motion_gate():
+    """Shared per-device motion / scene-change gate, or None if disabled."""
+    global _motion_gate
+
+    cfg = current_app.config
+
+    if not cfg.get("MOTION_GATE_ENABLED", True):
+        return None
+
+    if _motion_gate is None:
+        _motion_gate = MotionGate(
+            scene_threshold=cfg.get("MOTION_GATE_SCENE_THRESHOLD", 12.0),
+            min_distance_m=cfg.get("MOTION_GATE_MIN_DISTANCE_M", 8.0),
+            refresh_seconds=cfg.get("MOTION_GATE_REFRESH_SECONDS", 5.0)
+        )
+
+    return _motion_gate
+
+
+def _low_quality_response(reasons):
+    return {
+        "damage_type": "Low Quality",
+        "confidence": 0.0,
+        "detected": False,
+        "quality_reasons": reasons,
+        "annotated_image": None,
+        "skipped": False,
+        "cached": False
+    }
+
+
+def _float_or_none(value):
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# =====================================================
+# SHARED FRAME PIPELINE (HTTP + STREAM)
+# =====================================================
+def decode_target_size(device_id):
+    """
+    Smallest decoded long side that still feeds the device's imgsz at full
+    resolution after its ROI crop (see frame_io.decode_image).
+    """
+    profile = get_profile(device_id) or {}
+    imgsz = profile.get("imgsz", 320)
+    roi = profile.get("roi")
+
+    if not roi:
+        return imgsz
+
+    pts = roi if isinstance(roi[0], (list, tuple)) else [roi[:2], roi[2:]]
+    xs, ys = [p[0] for p in pts], [p[1] for p in pts]
+    fraction = max(max(xs) - min(xs), max(ys) - min(ys), 0.1)
+
+    return int(imgsz / fraction)
+
+
+def analyse_frame(device_id, frame, lat=None, lng=None, speed=None, boxes_only=False):
+    """
+    Quality gate → motion gate → near-duplicate cache → detection.
+    Returns the JSON-ready result dict for one dashcam frame; with
+    `boxes_only` it carries normalised `boxes` instead of an annotated image.
+    """
+
+    # Reject blurred / black / glare frames before they reach the model
+    if current_app.config.get("QUALITY_GATE_ENABLED", True):
+        reasons = check_frame_quality(frame)
+        quality_stats.record(device_id, reasons)
+
+        if reasons:
+            metrics.dashcam_frames.inc(str(device_id), "low_quality")
+            return _low_quality_response(reasons)
+
+    # Skip inference while the vehicle is idle and the scene is unchanged
+    gate = get_motion_gate()
+    if gate:
+        infer, _, last_result, thumb = gate.check(device_id, frame, lat, lng, speed)
+
+        if not infer:
+            skipped = dict(
+                last_result,
+                annotated_image=None,
+                skipped=True,
+                cached=False
+            )
+            skipped.pop("boxes", None)
+            metrics.dashcam_frames.inc(str(device_id), "skipped")
+            return skipped
+
+    # Reuse the result of a near-identical recent frame (stop-and-go)
+    cache = get_frame_cache()
+    frame_hash = dhash(frame) if cache else None
+    cached = cache.lookup(device_id, frame_hash) if cache else None
+
+    # Entries hold the annotation of the mode they were produced in
+    if cached is not None and cached[3] != boxes_only:
+        cached = None
+
+    if cached is not None:
+        damage, confidence, annotation, _, version = cached
+    else:
+        # Run detection
+        damage, confidence, annotation = detect_damage_with_frame(
+            frame,
+            cascade=cascade_enabled("dashcam"),
+            profile=get_profile(device_id),
+            boxes_only=boxes_only
+        )
+        version = last_model_version()
+
+    detected = damage not in (
+        "No Damage",
+        "Model Error",
+        "Detection Error",
+        "Image Not Found"
+    )
+
+    if cache and cached is None and damage not in ("Model Error", "Detection Error"):
+        cache.store(device_id, frame_hash, (damage, confidence, annotation, boxes_only, version))
+
+    result = {
+        "damage_type": damage,
+        "confidence": round(confidence, 3),
+        "detected": detected,
+        "annotated_image": annotation if detected and not boxes_only else None,
+        "model_version": version
+    }
+
+    if boxes_only:
+        result["boxes"] = (annotation or []) if detected else []
+
+    if gate and damage not in ("Model Error", "Detection Error"):
+        gate.record(device_id, thumb, result, lat, lng, speed)
+
+    metrics.dashcam_frames.inc(str(device_id), "cached" if cached is not None else "inferred")
+
+    return dict(result, skipped=False, cached=cached is not None)
+
 
 @dashcam_bp.route("/detect-frame", methods=["POST"])
 @jwt_required()
+@admission_controlled("dashcam")
 def detect_frame():
     """
     Realtime dashcam detection endpoint.
-    Receives base64 frame → runs ML detection → returns result.
+    Receives a frame → runs ML detection → returns result.
+    Frame as raw image/jpeg body (GPS in X-Latitude / X-Longitude /
+    X-Speed headers), multipart `frame` part, or legacy base64 JSON.
+    ?mode=boxes returns normalised boxes instead of an annotated image.
     No disk I/O for speed.
     """
 
-    data = request.get_json()
-
-    if not data or "frame" not in data:
-        return jsonify({"msg": "No frame provided"}), 400
-
     try:
-        frame_data = data["frame"]
+        device_id = get_jwt_identity()
 
-        # Remove base64 header if present
-        if "," in frame_data:
-            frame_data = frame_data.split(",")[1]
-
-        # Decode base64 → numpy image
-        frame_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame, data, error = read_frame_request(
+            request,
+            target_size=decode_target_size(device_id)
+        )
 
         if frame is None:
-            return jsonify({"msg": "Failed to decode frame"}), 400
-
-        # Run detection
-        damage, confidence, annotated_b64 = detect_damage_with_frame(frame)
-
-        detected = damage not in (
-            "No Damage",
-            "Model Error",
-            "Detection Error",
-            "Image Not Found"
+            return jsonify({"msg": error}), 400
+
+        result = analyse_frame(
+            device_id,
+            frame,
+            lat=_float_or_none(data.get("latitude")),
+            lng=_float_or_none(data.get("longitude")),
+            speed=_float_or_none(data.get("speed")),
+            boxes_only=read_response_mode(
+                request,
+                current_app.config.get("RESPONSE_MODE_DEFAULT", "image")
+            ) == "boxes"
         )
 
-        return jsonify({
-            "damage_type": damage,
-            "confidence": round(confidence, 3),
-            "detected": detected,
-            "annotated_image": annotated_b64 if detected else None
-        }), 200
+        return jsonify(result), 200
 
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
-    
+
+
 # =====================================================
-# 🚗 DASHCAM AUTO REPORT (aggregated realtime detection)
+# 📊 DASHCAM INFERENCE STATS
 # =====================================================
-@dashcam_bp.route('/submit-dashcam-session', methods=['POST'])
+@dashcam_bp.route("/stats", methods=["GET"])
 @jwt_required()
-def submit_dashcam_session():
+def inference_stats():
+    """
+    Officials get the server-wide counters; any other caller only their
+    own quality-gate entry (the other counters are keyed by identity or
+    describe the whole deployment).
+    """
+    if get_jwt().get("role") != "official":
+        own = quality_stats.stats().get(get_jwt_identity())
+        return jsonify({"frame_quality": own}), 200
 
-    data = request.get_json()
-    if not data:
-        return jsonify({"msg": "No data provided"}), 400
+    cache = get_frame_cache()
+    gate = get_motion_gate()
+    admission = get_admission()
 
-    user_id = get_jwt_identity()
-
-    first = data.get("first_damage")
-    last = data.get("last_damage")
-    if not last:
-        last = first
-    locations_raw = data.get("intermediate_locations", [])
+    return jsonify({
+        "admission": admission.stats() if admission else None,
+        "frame_cache": cache.stats() if cache else None,
+        "motion_gate": gate.stats() if gate else None,
+        "frame_quality": quality_stats.stats(),
+        "cascade": cascade_stats.stats(),
+        "inference_queue": inference_queue_stats(),
+        "cpu_layout": layout_stats(),
+        "model": model_info()
+    }), 200
 
-    # Only keep locations where detection confidence >= 0.5
-    locations = [
-        loc for loc in locations_raw
-        if float(loc.get("confidence", 0)) >= 0.3
-    ]
 
-    valid_detection_count = len(locations)
+# =====================================================
+# 🚗 DASHCAM AUTO REPORT (aggregated realtime detection)
+# =====================================================
+def save_dashcam_report(user_id, first, last, valid_detection_count):
+    """
+    Persist an aggregated dashcam detection session as a DamageReport.
+    `first` / `last` carry damage_type, confidence, base64 image, lat, lng, text,
+    and `annotated` (False when the image is the raw frame; browser
+    clients send the annotated frame, so it defaults to True).
+    Used by the HTTP session submit and the streaming channel.
+    """
+    last = last or first
 
-    if not first:
-        return jsonify({"msg": "No first detection"}), 400
-    
     # create folder
     image_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'images')
     os.makedirs(image_dir, exist_ok=True)
@@ -108,12 +295,12 @@ def submit_dashcam_session():
     # -------------------------
     first_filename = None
     if first.get("image"):
-        raw = first["image"].split(",")[1] if "," in first["image"] else first["image"]
-        img_bytes = base64.b64decode(raw)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = decode_b64_image(first["image"])
 
-        first_filename = f"dashcam_first_{user_id}_{int(time.time())}.jpg"
+        first_filename = report_image_name(
+            f"dashcam_first_{user_id}_{int(time.time())}",
+            first.get("annotated", True)
+        )
         cv2.imwrite(os.path.join(image_dir, first_filename), img)
 
     # -------------------------
@@ -122,12 +309,12 @@ def submit_dashcam_session():
     last_filename = None
     if last and last.get("image"):
 
-        raw = last["image"].split(",")[1] if "," in last["image"] else last["image"]
-        img_bytes = base64.b64decode(raw)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = decode_b64_image(last["image"])
 
-        last_filename = f"dashcam_last_{user_id}_{int(time.time())}.jpg"
+        last_filename = report_image_name(
+            f"dashcam_last_{user_id}_{int(time.time())}",
+            last.get("annotated", True)
+        )
         cv2.imwrite(os.path.join(image_dir, last_filename), img)
 
     # -------------------------
@@ -158,6 +345,7 @@ def submit_dashcam_session():
         longitude=first.get("lng"),
         detected_damage_type=first.get("damage_type"),
         confidence_score=round(confidence, 3),
+        model_version=first.get("model_version"),
         severity=severity,
         status="submitted",
         report_source="dashcam"
@@ -166,6 +354,37 @@ def submit_dashcam_session():
     db.session.add(report)
     db.session.commit()
 
+    return report
+
+
+@dashcam_bp.route('/submit-dashcam-session', methods=['POST'])
+@jwt_required()
+def submit_dashcam_session():
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"msg": "No data provided"}), 400
+
+    user_id = get_jwt_identity()
+
+    first = data.get("first_damage")
+    last = data.get("last_damage")
+    if not last:
+        last = first
+    locations_raw = data.get("intermediate_locations", [])
+
+    # Only keep locations where detection confidence >= 0.5
+    locations = [
+        loc for loc in locations_raw
+        if float(loc.get("confidence", 0)) >= 0.3
+    ]
+
+    valid_detection_count = len(locations)
+
+    if not first:
+        return jsonify({"msg": "No first detection"}), 400
+    
+    report = save_dashcam_report(user_id, first, last, valid_detection_count)
     log_audit(user_id, f"DASHCAM_AUTO_REPORT {report.id}")
 
     return jsonify({
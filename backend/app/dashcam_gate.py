@@ -0,0 +1,114 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+THUMB_SIZE = (64, 36)
+
+
+def _thumbnail(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    r = 6371000.0
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+# =====================================================
+# PER-DEVICE MOTION / SCENE-CHANGE GATE
+# =====================================================
+class MotionGate:
+    """
+    Decides whether a dashcam frame is worth running through the model.
+
+    A frame is analysed when any of these hold, relative to the last
+    analysed frame of the same device:
+      - scene change: mean absolute thumbnail difference >= scene_threshold
+      - moved: GPS distance (or speed x elapsed when GPS is missing)
+        >= min_distance_m
+      - refresh: refresh_seconds have passed
+    Otherwise the caller should return the device's last result.
+    """
+
+    def __init__(self, scene_threshold=12.0, min_distance_m=8.0, refresh_seconds=5.0, max_devices=1000):
+        self.scene_threshold = float(scene_threshold)
+        self.min_distance_m = float(min_distance_m)
+        self.refresh_seconds = float(refresh_seconds)
+        self.max_devices = int(max_devices)
+
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.analysed = 0
+        self.skipped = 0
+
+    def check(self, device_id, frame, lat=None, lng=None, speed=None):
+        """
+        Returns (infer, reason, last_result, thumb). `thumb` should be
+        passed back to `record()` after inference.
+        """
+        thumb = _thumbnail(frame)
+        now = time.monotonic()
+
+        with self._lock:
+            state = self._states.get(device_id)
+
+            if state is None or state["result"] is None:
+                reason = "first_frame"
+            elif now - state["time"] >= self.refresh_seconds:
+                reason = "refresh"
+            elif self._moved(state, lat, lng, speed, now):
+                reason = "moved"
+            elif float(np.mean(cv2.absdiff(thumb, state["thumb"]))) >= self.scene_threshold:
+                reason = "scene_change"
+            else:
+                self.skipped += 1
+                return False, "stationary", state["result"], thumb
+
+            self.analysed += 1
+            return True, reason, None, thumb
+
+    def record(self, device_id, thumb, result, lat=None, lng=None, speed=None):
+        with self._lock:
+            self._states[device_id] = {
+                "thumb": thumb,
+                "lat": lat,
+                "lng": lng,
+                "speed": speed,
+                "time": time.monotonic(),
+                "result": result
+            }
+            self._states.move_to_end(device_id)
+
+            while len(self._states) > self.max_devices:
+                self._states.popitem(last=False)
+
+    def _moved(self, state, lat, lng, speed, now):
+        if None not in (lat, lng, state["lat"], state["lng"]):
+            return haversine_m(state["lat"], state["lng"], lat, lng) >= self.min_distance_m
+
+        # No GPS fix: estimate distance from reported speed (m/s)
+        if speed is not None:
+            return float(speed) * (now - state["time"]) >= self.min_distance_m
+
+        return False
+
+    def stats(self):
+        with self._lock:
+            total = self.analysed + self.skipped
+
+            return {
+                "analysed": self.analysed,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / total, 3) if total else 0.0,
+                "devices": len(self._states)
+            }
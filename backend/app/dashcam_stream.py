@@ -0,0 +1,316 @@
+import json
+import time
+import threading
+import base64
+import numpy as np
+from flask import request, current_app
+from flask_jwt_extended import decode_token
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+
+from app.dashcam import (
+    analyse_frame,
+    save_dashcam_report,
+    decode_target_size,
+    _float_or_none
+)
+from app.frame_io import decode_image, read_response_mode
+from app.utils import log_audit
+from app.models import Device
+from app.admission import get_admission, throttle_payload
+
+sock = Sock()
+
+_stream_slots = None
+_stream_slots_lock = threading.Lock()
+
+# device_id -> open streams in this process
+_device_streams = {}
+
+
+def _acquire_stream_slot(cfg):
+    """Non-blocking: False when DASHCAM_STREAM_MAX streams are already open."""
+    global _stream_slots
+
+    if _stream_slots is None:
+        with _stream_slots_lock:
+            if _stream_slots is None:
+                _stream_slots = threading.BoundedSemaphore(max(1, cfg.get("DASHCAM_STREAM_MAX", 8)))
+
+    return _stream_slots.acquire(blocking=False)
+
+
+def _acquire_device_stream(device_id, limit):
+    with _stream_slots_lock:
+        if _device_streams.get(device_id, 0) >= limit:
+            return False
+        _device_streams[device_id] = _device_streams.get(device_id, 0) + 1
+        return True
+
+
+def _release_device_stream(device_id):
+    with _stream_slots_lock:
+        left = _device_streams.get(device_id, 0) - 1
+        if left > 0:
+            _device_streams[device_id] = left
+        else:
+            _device_streams.pop(device_id, None)
+
+
+def _stream_device(token):
+    """
+    Device id for a dashcam access token, else None. Only device tokens
+    (role "device"; tokens issued before the claim have no role) of a
+    registered device may stream; citizen / official tokens may not.
+    """
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+
+    if claims.get("type") != "access" or claims.get("role") not in (None, "device"):
+        return None
+
+    device_id = claims.get("sub")
+
+    return device_id if device_id and Device.query.get(device_id) else None
+
+
+# =====================================================
+# SERVER-SIDE SESSION AGGREGATION
+# =====================================================
+class StreamSession:
+    """
+    Groups one drive's detections into DamageReports, applying the same
+    rules dashcam.js used client-side: a per-detection cooldown, a
+    confidence floor, GPS required, and one report per interval.
+    """
+
+    def __init__(self, interval=30.0, cooldown=4.0, min_conf=0.4, max_locations=50):
+        self.interval = interval
+        self.cooldown = cooldown
+        self.min_conf = min_conf
+        self.max_locations = max_locations
+
+        self.last_logged = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.started = None
+        self.first = None
+        self.last = None
+        self.locations = []
+
+    def add(self, result, gps, frame_jpeg=None):
+        """
+        `frame_jpeg` (the raw uploaded frame) is stored as the report image
+        when the result carries boxes instead of an annotated image.
+        """
+        if not result.get("detected"):
+            return
+
+        now = time.monotonic()
+
+        if now - self.last_logged < self.cooldown:
+            return
+
+        self.last_logged = now
+
+        if gps.get("lat") is None or gps.get("lng") is None:
+            return
+
+        if result["confidence"] < self.min_conf:
+            return
+
+        image = result.get("annotated_image")
+        if image is None and frame_jpeg is not None:
+            image = base64.b64encode(frame_jpeg).decode("ascii")
+
+        damage = {
+            "damage_type": result["damage_type"],
+            "confidence": result["confidence"],
+            "image": image,
+            "annotated": result.get("annotated_image") is not None,
+            "lat": gps["lat"],
+            "lng": gps["lng"],
+            "text": gps.get("text") or "Unknown location",
+            "model_version": result.get("model_version")
+        }
+
+        if self.first is None:
+            self.first = damage
+            self.started = now
+
+        if len(self.locations) < self.max_locations:
+            self.locations.append({
+                "lat": gps["lat"],
+                "lng": gps["lng"],
+                "confidence": result["confidence"]
+            })
+
+        self.last = damage
+
+    def due(self):
+        return self.started is not None and time.monotonic() - self.started >= self.interval
+
+    def flush(self, device_id):
+        """Save the pending report (if any). Returns it, or None."""
+        if self.first is None:
+            return None
+
+        valid = sum(1 for loc in self.locations if loc["confidence"] >= 0.3)
+        report = save_dashcam_report(device_id, self.first, self.last, valid)
+        log_audit(
+            device_id,
+            f"DASHCAM_STREAM_REPORT {report.id} model={self.first.get('model_version')}"
+        )
+
+        self._reset()
+        self.last_logged = time.monotonic()
+
+        return report, valid
+
+
+def _send(ws, payload):
+    try:
+        ws.send(json.dumps(payload))
+    except ConnectionClosed:
+        pass
+
+
+# =====================================================
+# 🔌 DASHCAM STREAM (one connection per drive)
+# =====================================================
+@sock.route("/api/dashcam/stream")
+def dashcam_stream(ws):
+    """
+    Long-lived dashcam channel. Auth once via ?token=<JWT>;
+    ?mode=boxes returns normalised boxes instead of annotated images.
+
+    Client → server:
+      text   {"type": "gps", "latitude", "longitude", "speed", "location"}
+      binary JPEG frame (uses the latest GPS fix)
+      text   {"type": "end"}
+    Server → client:
+      {"type": "result", ...same fields as /detect-frame...}
+      {"type": "report_saved", "report_id", "valid_detections"}
+      {"type": "throttled", "retry_after", "suggested_interval_ms"}
+    Pending detections are saved as a report when the channel closes.
+    """
+    device_id = _stream_device(request.args.get("token", ""))
+
+    if device_id is None:
+        ws.close(reason=1008, message="Invalid token")
+        return
+
+    cfg = current_app.config
+
+    # One token can't hold more than a couple of sockets / threads
+    if not _acquire_device_stream(device_id, cfg.get("DASHCAM_STREAM_MAX_PER_DEVICE", 2)):
+        ws.close(reason=1008, message="Too many streams for this device")
+        return
+
+    try:
+        # Streams hold a server thread each; refuse rather than starve HTTP
+        if not _acquire_stream_slot(cfg):
+            ws.close(reason=1013, message="Too many streams, retry later")
+            return
+
+        try:
+            _serve_stream(ws, cfg, device_id)
+        finally:
+            _stream_slots.release()
+
+    finally:
+        _release_device_stream(device_id)
+
+
+def _serve_stream(ws, cfg, device_id):
+    """Frame loop of one drive (runs while holding a stream slot)."""
+    admission = get_admission()
+
+    target_size = decode_target_size(device_id)
+    boxes_only = read_response_mode(
+        request,
+        cfg.get("RESPONSE_MODE_DEFAULT", "image")
+    ) == "boxes"
+    session = StreamSession(interval=cfg.get("DASHCAM_STREAM_REPORT_INTERVAL", 30))
+    gps = {"lat": None, "lng": None, "speed": None, "text": None}
+
+    try:
+        while True:
+            msg = ws.receive(timeout=cfg.get("DASHCAM_STREAM_IDLE_TIMEOUT", 60))
+
+            if msg is None:
+                break  # idle timeout
+
+            if isinstance(msg, str):
+                data = json.loads(msg)
+
+                if data.get("type") == "end":
+                    break
+
+                if data.get("type") == "gps":
+                    gps = {
+                        "lat": _float_or_none(data.get("latitude")),
+                        "lng": _float_or_none(data.get("longitude")),
+                        "speed": _float_or_none(data.get("speed")),
+                        "text": data.get("location")
+                    }
+                continue
+
+            # Same admission control as /detect-frame; the frame is dropped
+            if admission:
+                admitted, reason, retry_after = admission.admit(("dashcam", device_id))
+
+                if not admitted:
+                    _send(ws, dict(throttle_payload(reason, retry_after), type="throttled"))
+                    continue
+
+            started = time.monotonic()
+
+            try:
+                frame = decode_image(np.frombuffer(msg, np.uint8), target_size)
+
+                if frame is None:
+                    _send(ws, {"type": "error", "msg": "Failed to decode frame"})
+                    continue
+
+                result = analyse_frame(
+                    device_id,
+                    frame,
+                    gps["lat"],
+                    gps["lng"],
+                    gps["speed"],
+                    boxes_only=boxes_only
+                )
+            finally:
+                if admission:
+                    admission.release(started)
+
+            _send(ws, dict(result, type="result"))
+
+            if not result["skipped"]:
+                session.add(result, gps, frame_jpeg=msg if boxes_only else None)
+
+            if session.due():
+                saved = session.flush(device_id)
+                if saved:
+                    _send(ws, {
+                        "type": "report_saved",
+                        "report_id": saved[0].id,
+                        "valid_detections": saved[1]
+                    })
+
+    except ConnectionClosed:
+        pass
+
+    except Exception as e:
+        current_app.logger.error(f"Dashcam stream error: {e}")
+
+    finally:
+        # Build the report for whatever the drive collected since the last one
+        try:
+            session.flush(device_id)
+        except Exception as e:
+            current_app.logger.error(f"Dashcam stream final report failed: {e}")
@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+
+# Labels returned instead of a class name when no usable detection exists
+BAD_LABELS = {"No Damage", "Model Error", "Detection Error", "Image Not Found", "Low Quality"}
+
+_COLORS = [
+    (0, 0, 255),
+    (0, 165, 255),
+    (255, 0, 255),
+    (255, 128, 0),
+    (0, 200, 0),
+]
+
+
+# =====================================================
+# STRUCTURED DETECTION RESULT
+# =====================================================
+class Detections:
+    """
+    All detections for one frame, held as NumPy arrays.
+
+    xyxy  : (N, 4) float32 box corners in pixels of `shape`
+    conf  : (N,)   float32 confidences
+    cls   : (N,)   int32 class ids
+    names : {class_id: class_name}
+    shape : (height, width) of the frame the boxes refer to
+    model_version : weights version that produced them (None if unknown)
+    """
+
+    __slots__ = ("xyxy", "conf", "cls", "names", "shape", "model_version")
+
+    def __init__(self, xyxy, conf, cls, names, shape, model_version=None):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+        self.shape = tuple(shape[:2])
+        self.model_version = model_version
+
+    # -------------------------
+    # Constructors
+    # -------------------------
+    @classmethod
+    def from_array(cls, data, names, shape, model_version=None):
+        """Build from an (N, 6) array of x1, y1, x2, y2, conf, cls rows."""
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+
+        return cls(
+            data[:, :4],
+            data[:, 4],
+            data[:, 5].astype(np.int32),
+            names,
+            shape,
+            model_version
+        )
+
+    @classmethod
+    def from_result(cls, r):
+        """Build from an Ultralytics Results object with one device transfer."""
+        if r.boxes is None or not len(r.boxes):
+            data = np.empty((0, 6), dtype=np.float32)
+        else:
+            data = r.boxes.data.cpu().numpy()
+
+        return cls.from_array(data, r.names, r.orig_shape, getattr(r, "model_version", None))
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def __len__(self):
+        return len(self.conf)
+
+    def best(self):
+        """Return (class_name, confidence) of the strongest box."""
+        if not len(self):
+            return "No Damage", 0.0
+
+        i = int(self.conf.argmax())
+        return self.label(self.cls[i]), float(self.conf[i])
+
+    def label(self, cls_id):
+        return self.names.get(int(cls_id), str(int(cls_id)))
+
+    def to_tuples(self):
+        """Compact (x1, y1, x2, y2, conf, cls_id) rows."""
+        return [
+            tuple(row)
+            for row in np.column_stack([self.xyxy, self.conf, self.cls]).tolist()
+        ]
+
+    def to_boxes(self, decimals=4):
+        """
+        Compact JSON overlay: [{"label", "conf", "box"}] with box corners
+        normalised to 0-1 of `shape`, so clients can draw at any size.
+        """
+        h, w = self.shape
+        norm = (self.xyxy / np.array([w, h, w, h], dtype=np.float32)).clip(0, 1)
+
+        return [
+            {
+                "label": self.label(cls_id),
+                "conf": round(conf, 3),
+                "box": [round(v, decimals) for v in box]
+            }
+            for box, conf, cls_id in zip(norm.tolist(), self.conf.tolist(), self.cls.tolist())
+        ]
+
+    def transform(self, scale_x, scale_y, offset_x, offset_y, shape):
+        """Map boxes into another frame (e.g. from an ROI crop to the full frame)."""
+        xyxy = self.xyxy * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        xyxy += np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.float32)
+
+        return Detections(xyxy, self.conf, self.cls, self.names, shape, self.model_version)
+
+    # -------------------------
+    # Rendering
+    # -------------------------
+    def render(self, frame):
+        """Draw all boxes on a copy of `frame` (which must match `shape`)."""
+        annotated = frame.copy()
+
+        for (x1, y1, x2, y2), conf, cls_id in zip(
+            self.xyxy.astype(np.int32).tolist(),
+            self.conf.tolist(),
+            self.cls.tolist()
+        ):
+            color = _COLORS[cls_id % len(_COLORS)]
+
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(
+                annotated,
+                f"{self.label(cls_id)} {conf:.2f}",
+                (x1, max(y1 - 5, 12)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                1,
+                cv2.LINE_AA
+            )
+
+        return annotated
@@ -5,8 +5,10 @@ from flask_jwt_extended import (
     get_jwt_identity
 )
 from datetime import timedelta
+import json
 from . import db
-from .models import Device
+from .models import Device, DeviceProfile
+from .device_profiles import profile_to_dict, validate_profile, invalidate_profile
 
 auth_bp = Blueprint("device_auth", __name__, url_prefix="/api/device")
 
@@ -85,6 +87,7 @@ def device_login():
 
     access_token = create_access_token(
         identity=str(device.id),
+        additional_claims={"role": "device"},
         expires_delta=timedelta(days=7)
     )
 
@@ -113,4 +116,68 @@ def current_device():
         "id": device.id,
         "device_id": device.device_id,
         "vehicle_no": device.vehicle_no
-    }), 200
\ No newline at end of file
+    }), 200
+
+# =================================================
+# DEVICE INFERENCE PROFILE (ROI / imgsz / conf)
+# =================================================
+@auth_bp.route("/profile", methods=["GET"])
+@jwt_required()
+def get_device_profile():
+
+    device_id = get_jwt_identity()
+
+    profile = DeviceProfile.query.get(device_id)
+
+    return jsonify({
+        "device": device_id,
+        "profile": profile_to_dict(profile)
+    }), 200
+
+
+@auth_bp.route("/profile", methods=["PUT"])
+@jwt_required()
+def update_device_profile():
+
+    device_id = get_jwt_identity()
+
+    if not Device.query.get(device_id):
+        return jsonify({"msg": "Device not found"}), 404
+
+    data = request.get_json(silent=True)
+
+    if not data:
+        return jsonify({"msg": "Missing JSON body"}), 400
+
+    clean, error = validate_profile(data)
+
+    if error:
+        return jsonify({"msg": error}), 400
+
+    try:
+
+        profile = DeviceProfile.query.get(device_id) or DeviceProfile(device_id=device_id)
+
+        profile.roi = json.dumps(clean["roi"]) if clean["roi"] else None
+        profile.imgsz = clean["imgsz"]
+        profile.conf_threshold = clean["conf"]
+        profile.resize_mode = clean["resize_mode"]
+
+        db.session.add(profile)
+        db.session.commit()
+
+    except Exception as e:
+
+        db.session.rollback()
+
+        return jsonify({
+            "msg": "Database error",
+            "error": str(e)
+        }), 500
+
+    invalidate_profile(device_id)
+
+    return jsonify({
+        "msg": "Profile updated",
+        "profile": profile_to_dict(profile)
+    }), 200
@@ -0,0 +1,103 @@
+import json
+import time
+import threading
+from .models import DeviceProfile
+
+RESIZE_MODES = ("resize", "letterbox")
+IMGSZ_CHOICES = (160, 192, 224, 256, 288, 320, 416, 480, 512, 640)
+
+# Profiles are read on every dashcam frame, so keep them in memory briefly
+PROFILE_TTL_SECONDS = 30
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# =====================================================
+# SERIALISATION
+# =====================================================
+def profile_to_dict(profile):
+    if profile is None:
+        return None
+
+    return {
+        "roi": json.loads(profile.roi) if profile.roi else None,
+        "imgsz": profile.imgsz,
+        "conf": profile.conf_threshold,
+        "resize_mode": profile.resize_mode
+    }
+
+
+def validate_profile(data):
+    """
+    Validate a profile payload. Returns (clean_dict, error_message).
+    ROI is either [x1, y1, x2, y2] or a polygon [[x, y], ...] in 0..1 coords.
+    """
+    roi = data.get("roi")
+
+    if roi is not None:
+        try:
+            if len(roi) == 4 and all(isinstance(v, (int, float)) for v in roi):
+                x1, y1, x2, y2 = (float(v) for v in roi)
+                if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+                    return None, "ROI rectangle must satisfy 0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1"
+                roi = [x1, y1, x2, y2]
+            else:
+                roi = [[float(x), float(y)] for x, y in roi]
+                if len(roi) < 3 or not all(0 <= v <= 1 for pt in roi for v in pt):
+                    return None, "ROI polygon needs >= 3 points in 0..1 coords"
+        except (TypeError, ValueError):
+            return None, "Invalid ROI"
+
+    try:
+        imgsz = int(data.get("imgsz", 320))
+        conf = float(data.get("conf", 0.25))
+    except (TypeError, ValueError):
+        return None, "imgsz and conf must be numbers"
+
+    if imgsz not in IMGSZ_CHOICES:
+        return None, f"imgsz must be one of {list(IMGSZ_CHOICES)}"
+
+    if not 0.01 <= conf <= 0.95:
+        return None, "conf must be between 0.01 and 0.95"
+
+    resize_mode = data.get("resize_mode", "resize")
+    if resize_mode not in RESIZE_MODES:
+        return None, f"resize_mode must be one of {list(RESIZE_MODES)}"
+
+    return {
+        "roi": roi,
+        "imgsz": imgsz,
+        "conf": conf,
+        "resize_mode": resize_mode
+    }, None
+
+
+# =====================================================
+# CACHED LOOKUP
+# =====================================================
+def get_profile(device_id):
+    """Return the device's profile as a dict, or None if it has none."""
+    now = time.monotonic()
+
+    with _cache_lock:
+        hit = _cache.get(device_id)
+        if hit and now - hit[0] < PROFILE_TTL_SECONDS:
+            return hit[1]
+
+    try:
+        profile = profile_to_dict(DeviceProfile.query.get(device_id))
+    except Exception as e:
+        # Missing table / DB hiccup must not break realtime detection
+        print(f"Device profile lookup failed: {e}")
+        profile = None
+
+    with _cache_lock:
+        _cache[device_id] = (now, profile)
+
+    return profile
+
+
+def invalidate_profile(device_id):
+    with _cache_lock:
+        _cache.pop(device_id, None)
@@ -0,0 +1,104 @@
+import time
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+
+# =====================================================
+# PERCEPTUAL HASH
+# =====================================================
+def dhash(frame, size=8):
+    """
+    Difference hash of a BGR frame as a (size * size)-bit int.
+    Computed on a tiny grayscale copy, so near-identical frames
+    (same scene, sensor noise, small exposure drift) hash close together.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# =====================================================
+# PER-DEVICE LRU + TTL RESULT CACHE
+# =====================================================
+class FrameResultCache:
+    """
+    Remembers the detection result of each device's recent frames.
+
+    A new frame whose hash is within `max_distance` bits of a cached,
+    unexpired frame of the same device reuses that frame's result.
+    Each device keeps at most `max_entries` hashes; the least recently
+    used devices are evicted beyond `max_devices`.
+    """
+
+    def __init__(self, ttl_seconds=3.0, max_distance=5, max_entries=16, max_devices=1000):
+        self.ttl = float(ttl_seconds)
+        self.max_distance = int(max_distance)
+        self.max_entries = int(max_entries)
+        self.max_devices = int(max_devices)
+
+        self._devices = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, device_id, frame_hash):
+        now = time.monotonic()
+
+        with self._lock:
+            entries = self._devices.get(device_id)
+
+            if entries is not None:
+                self._devices.move_to_end(device_id)
+
+                # Drop expired entries (oldest first)
+                for h in [h for h, (ts, _) in entries.items() if now - ts > self.ttl]:
+                    del entries[h]
+
+                best_hash, best_dist = None, self.max_distance + 1
+                for h in entries:
+                    dist = hamming(h, frame_hash)
+                    if dist < best_dist:
+                        best_hash, best_dist = h, dist
+
+                if best_hash is not None:
+                    entries.move_to_end(best_hash)
+                    self.hits += 1
+                    return entries[best_hash][1]
+
+            self.misses += 1
+            return None
+
+    def store(self, device_id, frame_hash, result):
+        with self._lock:
+            entries = self._devices.setdefault(device_id, OrderedDict())
+            self._devices.move_to_end(device_id)
+
+            entries[frame_hash] = (time.monotonic(), result)
+            entries.move_to_end(frame_hash)
+
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+            while len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "devices": len(self._devices),
+                "entries": sum(len(e) for e in self._devices.values())
+            }
@@ -0,0 +1,203 @@
+import base64
+from urllib.parse import unquote
+import cv2
+import numpy as np
+from app import metrics
+
+# Metadata headers accepted with raw binary frame uploads
+META_HEADERS = {
+    "latitude": "X-Latitude",
+    "longitude": "X-Longitude",
+    "speed": "X-Speed",
+    "location": "X-Location"
+}
+
+
+# Realtime response payloads: annotated JPEG or normalised box JSON
+RESPONSE_MODES = ("image", "boxes")
+
+# libjpeg DCT scaling: decode directly at 1/2, 1/4 or 1/8 resolution
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# SOF markers carrying the frame size (all except DHT / JPG / DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# =====================================================
+# DECODE
+# =====================================================
+def jpeg_size(data):
+    """
+    (width, height) read from a JPEG's SOF header without decoding,
+    or None if `data` (bytes / uint8 buffer) is not a JPEG.
+    """
+    data = memoryview(data).cast("B")
+    n = len(data)
+
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+
+        marker = data[i + 1]
+
+        # Fill bytes / standalone markers have no length field
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+
+        if marker in _SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+
+    return None
+
+
+def reduced_decode_flag(size, target_size):
+    """Largest DCT reduction keeping the long side >= target_size."""
+    if not size or not target_size:
+        return cv2.IMREAD_COLOR
+
+    long_side = max(size)
+
+    for factor, flag in _REDUCED_FLAGS:
+        if long_side // factor >= target_size:
+            return flag
+
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(buf, target_size=None):
+    """
+    Decode an encoded image held in a uint8 numpy buffer (BGR or None).
+    With `target_size` (the model imgsz), JPEGs are decoded at the
+    smallest 1/2, 1/4, 1/8 scale whose long side is still >= target_size.
+    """
+    if buf is None or not buf.size:
+        return None
+
+    flag = reduced_decode_flag(jpeg_size(buf), target_size) if target_size else cv2.IMREAD_COLOR
+
+    with metrics.stage("imdecode"):
+        return cv2.imdecode(buf, flag)
+
+
+def read_image(path, target_size=None):
+    """cv2.imread counterpart of decode_image for files on disk."""
+    flag = cv2.IMREAD_COLOR
+
+    if target_size:
+        try:
+            with open(path, "rb") as f:
+                head = f.read(256 * 1024)
+            flag = reduced_decode_flag(jpeg_size(head), target_size)
+        except OSError:
+            return None
+
+    return cv2.imread(path, flag)
+
+
+def decode_b64_image(data, target_size=None):
+    """Decode a base64 / data-URL image string (JSON compatibility path)."""
+    if "," in data:
+        data = data.split(",", 1)[1]
+
+    with metrics.stage("b64_decode"):
+        buf = np.frombuffer(base64.b64decode(data), np.uint8)
+
+    return decode_image(buf, target_size)
+
+
+def _read_body(req):
+    """
+    Read a raw request body into one preallocated buffer, straight from
+    the WSGI input stream (no bytes/str intermediates).
+    """
+    length = req.content_length
+    stream = req.stream
+
+    if not length:
+        return np.frombuffer(stream.read(), np.uint8)
+
+    buf = bytearray(length)
+    view = memoryview(buf)
+    n = 0
+
+    while n < length:
+        got = stream.readinto(view[n:])
+        if not got:
+            break
+        n += got
+
+    return np.frombuffer(buf, np.uint8, count=n)
+
+
+# =====================================================
+# REQUEST INGESTION
+# =====================================================
+def read_frame_request(req, field="frame", target_size=None):
+    """
+    Decode a frame and its metadata from a Flask request.
+
+    Accepted encodings:
+      - raw body, Content-Type image/* (metadata in X-Latitude, X-Longitude,
+        X-Speed, X-Location headers)
+      - multipart/form-data with a `frame` file part (metadata as form fields)
+      - JSON {"frame": "data:image/jpeg;base64,...", ...} (compatibility shim)
+
+    `target_size` enables reduced-resolution JPEG decoding (see decode_image).
+
+    Returns (frame, meta, error). `frame` is None and `error` is set when
+    nothing could be decoded.
+    """
+    mimetype = req.mimetype or ""
+
+    if mimetype.startswith("image/") or mimetype == "application/octet-stream":
+        meta = {
+            key: unquote(req.headers[header])
+            for key, header in META_HEADERS.items()
+            if header in req.headers
+        }
+        buf = _read_body(req)
+
+    elif mimetype == "multipart/form-data":
+        meta = req.form.to_dict()
+        file = req.files.get(field)
+        if file is None:
+            return None, meta, "No frame provided"
+        buf = np.frombuffer(file.read(), np.uint8)
+
+    else:
+        meta = req.get_json(silent=True)
+        if not meta or field not in meta:
+            return None, meta or {}, "No frame provided"
+        frame = decode_b64_image(meta.pop(field), target_size)
+        return frame, meta, None if frame is not None else "Failed to decode frame"
+
+    frame = decode_image(buf, target_size)
+
+    return frame, meta, None if frame is not None else "Failed to decode frame"
+
+
+def read_response_mode(req, default="image"):
+    """
+    Requested response payload, from ?mode= or the X-Response-Mode header.
+    Unknown values fall back to `default`.
+    """
+    mode = req.args.get("mode") or req.headers.get("X-Response-Mode") or default
+    mode = mode.lower()
+
+    return mode if mode in RESPONSE_MODES else default
@@ -0,0 +1,370 @@
+import os
+import time
+import atexit
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+import numpy as np
+
+from app import metrics
+from app.inference_scheduler import PriorityGate
+from app.cpu_topology import plan_layout
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# WORKER PROCESS
+# =====================================================
+def _worker_main(worker_id, shm_name, slot_bytes, tasks, results, max_batch, layout):
+    """
+    Inference worker loop. Frames are read straight out of the shared
+    ring buffer; only slot indices and compact detection tuples travel
+    over the queues.
+    """
+    from app import cpu_topology
+
+    # Pin + size thread pools before torch is imported
+    cpu_topology.apply_layout(layout)
+
+    from app import ml_utils
+    from app.detections import Detections
+
+    ml_utils.load_model()
+    ml_utils.start_model_watcher()
+
+    if ml_utils.model is None:
+        results.put(("error", worker_id, "Model not loaded"))
+        return
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    results.put(("ready", worker_id, dict(ml_utils.model.names), ml_utils.model_version))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        # Drain whatever else is already waiting into the same forward pass
+        batch = [task]
+        while len(batch) < max_batch:
+            try:
+                extra = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if extra is None:
+                tasks.put(None)
+                break
+            batch.append(extra)
+
+        # Lets the parent fail exactly these requests if this process dies
+        results.put(("taken", worker_id, [item[0] for item in batch], os.getpid()))
+
+        groups = {}
+        for item in batch:
+            groups.setdefault((item[3], item[4]), []).append(item)
+
+        for (imgsz, conf), items in groups.items():
+            frames = [
+                np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                for _, slot, shape, _, _ in items
+            ]
+
+            try:
+                started = time.perf_counter()
+                outputs = ml_utils._predict_batch(frames, imgsz, conf)
+
+                # Metrics live in the web process's registry, not this one
+                results.put(("batch", worker_id, len(frames), imgsz, time.perf_counter() - started))
+
+                for (req_id, slot, _, _, _), r in zip(items, outputs):
+                    detections = Detections.from_result(r).to_tuples()
+                    results.put(("done", req_id, slot, (detections, r.model_version), None))
+
+            except Exception as e:
+                for req_id, slot, _, _, _ in items:
+                    results.put(("done", req_id, slot, None, str(e)))
+
+            del frames
+
+    shm.close()
+
+
+# =====================================================
+# POOL (PARENT SIDE)
+# =====================================================
+class InferencePool:
+    """
+    Pool of dedicated inference processes fed through a shared-memory
+    ring of fixed-size frame slots.
+
+    `infer()` copies a decoded frame into a free slot, queues the slot
+    index and returns the worker's detections as a list of
+    (x1, y1, x2, y2, conf, cls_id) tuples, plus the version of the model
+    that produced them (workers hot-swap weights independently). When all slots are busy the
+    caller blocks, which bounds memory and applies back-pressure; free
+    slots go to waiting callers by priority class (see PriorityGate).
+    """
+
+    def __init__(self, workers, slots=None, slot_bytes=1280 * 1280 * 3, max_batch=4,
+                 aging_seconds=2.0):
+        self.workers = max(1, int(workers))
+        self.slots = int(slots or self.workers * 2)
+        self.slot_bytes = int(slot_bytes)
+        self.names = {}
+        self.model_version = None
+
+        self._shm = shared_memory.SharedMemory(
+            create=True,
+            size=self.slots * self.slot_bytes
+        )
+
+        self._free = list(range(self.slots))
+        self._free_lock = threading.Lock()
+        self._slot_gate = PriorityGate(self.slots, aging_seconds=aging_seconds)
+
+        self._ids = itertools.count()
+        # req_id -> (future, slot); whoever pops an entry frees its slot.
+        # Entries outlive a caller's timeout until the worker answers
+        self._futures = {}
+        # req_id -> worker that took it off the task queue
+        self._assigned = {}
+        self._futures_lock = threading.Lock()
+        self._ready = threading.Event()
+
+        # Workers that finished loading (only those are respawned on death)
+        self._started = set()
+        self._closing = False
+
+        # Spawn: workers must not inherit the parent's torch / thread state
+        self._ctx = mp.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._max_batch = max_batch
+
+        # Each worker gets its own share of this process's cores
+        self._layouts = plan_layout(self.workers)
+
+        self._procs = [self._spawn(i) for i in range(self.workers)]
+
+        threading.Thread(
+            target=self._dispatch,
+            name="inference-pool-results",
+            daemon=True
+        ).start()
+
+        atexit.register(self.close)
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def fits(self, frame):
+        return frame.dtype == np.uint8 and frame.nbytes <= self.slot_bytes
+
+    def infer(self, frame, imgsz, conf=0.25, timeout=30, priority="interactive"):
+        if not self.fits(frame):
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit a {self.slot_bytes} byte slot")
+
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Inference workers not ready")
+
+        if not self._slot_gate.acquire(priority, timeout=timeout):
+            raise TimeoutError("No free inference slot")
+
+        with self._free_lock:
+            slot = self._free.pop()
+
+        req_id = next(self._ids)
+        future = Future()
+
+        with self._futures_lock:
+            self._futures[req_id] = (future, slot)
+
+        try:
+            view = np.ndarray(
+                frame.shape,
+                dtype=np.uint8,
+                buffer=self._shm.buf,
+                offset=slot * self.slot_bytes
+            )
+            view[...] = frame
+            del view
+
+            self._tasks.put((req_id, slot, frame.shape, imgsz, conf))
+
+        except BaseException:
+            # Never reached a worker: the slot is free again
+            self._release(req_id)
+            raise
+
+        # On timeout the request stays registered: a worker may still be
+        # reading its slot, which is freed by the late answer (dropped) or
+        # once that worker is found dead
+        return future.result(timeout)
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def stats(self):
+        with self._futures_lock:
+            in_flight = len(self._futures)
+
+        return {
+            "workers": self.workers,
+            "alive": sum(p is not None and p.is_alive() for p in self._procs),
+            "slots": self.slots,
+            "free_slots": len(self._free),
+            "waiting": self._slot_gate.waiting(),
+            "in_flight": in_flight
+        }
+
+    def close(self):
+        self._closing = True
+
+        for _ in self._procs:
+            try:
+                self._tasks.put(None)
+            except Exception:
+                pass
+
+        for p in self._procs:
+            if p is not None:
+                p.join(timeout=2)
+
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except Exception:
+            pass
+
+    # -------------------------
+    # Workers
+    # -------------------------
+    def _spawn(self, worker_id):
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._shm.name, self.slot_bytes, self._tasks,
+                  self._results, self._max_batch, self._layouts[worker_id]),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        p.start()
+        return p
+
+    def _release(self, req_id):
+        """Forget a request and free its slot (once). Returns its future or None."""
+        with self._futures_lock:
+            entry = self._futures.pop(req_id, None)
+            self._assigned.pop(req_id, None)
+
+        if entry is None:
+            return None
+
+        future, slot = entry
+
+        with self._free_lock:
+            self._free.append(slot)
+        self._slot_gate.release()
+
+        return future
+
+    def _check_workers(self):
+        """Fail the requests of dead workers and start replacements."""
+        for worker_id, p in enumerate(self._procs):
+            if p is None or p.is_alive() or self._closing:
+                continue
+
+            with self._futures_lock:
+                lost = [r for r, w in self._assigned.items() if w == worker_id]
+
+            for req_id in lost:
+                future = self._release(req_id)
+                if future is not None:
+                    future.set_exception(RuntimeError(f"Inference worker {worker_id} died"))
+
+            if worker_id not in self._started:
+                # Never got as far as loading the model: restarting won't help
+                logger.error(f"Inference worker {worker_id} exited during start-up (code {p.exitcode})")
+                self._procs[worker_id] = None
+                continue
+
+            logger.warning(
+                f"Inference worker {worker_id} died (code {p.exitcode}), "
+                f"{len(lost)} request(s) failed; restarting"
+            )
+            self._started.discard(worker_id)
+            self._procs[worker_id] = self._spawn(worker_id)
+
+    # -------------------------
+    # Result fan-out
+    # -------------------------
+    def _dispatch(self):
+        last_check = time.monotonic()
+
+        while True:
+            if time.monotonic() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.monotonic()
+
+            try:
+                msg = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+
+            kind = msg[0]
+
+            if kind == "ready":
+                self.names = msg[2]
+                self.model_version = msg[3]
+                self._started.add(msg[1])
+                self._ready.set()
+                logger.info(f"Inference worker {msg[1]} ready")
+                continue
+
+            if kind == "error":
+                logger.error(f"Inference worker {msg[1]} failed: {msg[2]}")
+                continue
+
+            if kind == "batch":
+                _, _, size, imgsz, seconds = msg
+                metrics.batch_size.observe(size)
+                metrics.model_forward_seconds.observe(seconds, str(imgsz))
+                continue
+
+            if kind == "taken":
+                _, worker_id, req_ids, pid = msg
+                proc = self._procs[worker_id]
+
+                if proc is None or proc.pid != pid or not proc.is_alive():
+                    # Taken by a process that has died since
+                    for req_id in req_ids:
+                        future = self._release(req_id)
+                        if future is not None:
+                            future.set_exception(RuntimeError(f"Inference worker {worker_id} died"))
+                    continue
+
+                with self._futures_lock:
+                    for req_id in req_ids:
+                        if req_id in self._futures:
+                            self._assigned[req_id] = worker_id
+                continue
+
+            _, req_id, _, detections, error = msg
+
+            future = self._release(req_id)
+
+            if future is None:
+                continue
+
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                # Most recent version any worker answered with
+                self.model_version = detections[1]
+                future.set_result(detections)
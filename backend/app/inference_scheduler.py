@@ -0,0 +1,299 @@
+import math
+import logging
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# PRIORITY CLASSES
+# =====================================================
+# Lower level is served first:
+#   realtime    - dashcam frames (moving vehicles)
+#   interactive - citizen previews / live camera, officials opening reports
+#   batch       - report re-inference, video analysis
+PRIORITIES = {"realtime": 0, "interactive": 1, "batch": 2}
+
+
+def priority_level(priority):
+    return PRIORITIES.get(priority, PRIORITIES["interactive"])
+
+
+def effective_priority(level, enqueued, now, aging_seconds):
+    """Waiting work gains one priority level per `aging_seconds`."""
+    if aging_seconds <= 0:
+        return level
+
+    return level - (now - enqueued) / aging_seconds
+
+
+class QueueWaitStats:
+    """Queue-wait time per priority class (sliding window of recent waits)."""
+
+    def __init__(self, window=256):
+        self._lock = threading.Lock()
+        self._waits = {name: deque(maxlen=window) for name in PRIORITIES}
+        self._counts = dict.fromkeys(PRIORITIES, 0)
+        self._max = dict.fromkeys(PRIORITIES, 0.0)
+
+    def record(self, priority, seconds):
+        if priority not in PRIORITIES:
+            priority = "interactive"
+
+        with self._lock:
+            self._waits[priority].append(seconds)
+            self._counts[priority] += 1
+            self._max[priority] = max(self._max[priority], seconds)
+
+        metrics.queue_wait_seconds.observe(seconds, priority)
+
+    def stats(self):
+        with self._lock:
+            out = {}
+
+            for name in PRIORITIES:
+                waits = sorted(self._waits[name])
+                p95 = waits[min(len(waits) - 1, int(math.ceil(0.95 * len(waits))) - 1)] if waits else 0.0
+
+                out[name] = {
+                    "count": self._counts[name],
+                    "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                    "p95_wait_ms": round(p95 * 1000, 2),
+                    "max_wait_ms": round(self._max[name] * 1000, 2)
+                }
+
+            return out
+
+
+# Shared by every queue in front of the model (scheduler, gate, pool slots)
+queue_wait_stats = QueueWaitStats()
+
+
+# =====================================================
+# PRIORITY GATE (MODEL / SLOT ACCESS)
+# =====================================================
+class PriorityGate:
+    """
+    Counting semaphore whose waiters are served by priority class, with
+    aging so batch work still progresses under sustained realtime load.
+    Used as the model lock and for the worker pool's frame slots.
+    """
+
+    def __init__(self, value=1, aging_seconds=2.0, stats=queue_wait_stats):
+        self.aging_seconds = float(aging_seconds)
+        self.stats = stats
+
+        self._value = int(value)
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority="interactive", timeout=None, record=True):
+        """
+        Block until granted. Returns False if `timeout` expires first.
+        `record=False` skips the wait metric (already counted upstream).
+        """
+        enqueued = time.monotonic()
+        entry = (priority_level(priority), enqueued, next(self._seq))
+        deadline = None if timeout is None else enqueued + timeout
+
+        with self._cond:
+            self._waiters.append(entry)
+
+            try:
+                while not (self._value > 0 and self._head() is entry):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+
+                    if remaining is not None and remaining <= 0:
+                        return False
+
+                    self._cond.wait(remaining)
+
+                self._value -= 1
+
+            finally:
+                self._waiters.remove(entry)
+                # Head of the line may have changed (grant or timeout)
+                self._cond.notify_all()
+
+        if record and self.stats is not None:
+            self.stats.record(priority, time.monotonic() - enqueued)
+
+        return True
+
+    def release(self):
+        with self._cond:
+            self._value += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def hold(self, priority="interactive", record=True):
+        self.acquire(priority, record=record)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def waiting(self):
+        with self._cond:
+            return len(self._waiters)
+
+    def _head(self):
+        now = time.monotonic()
+
+        return min(
+            self._waiters,
+            key=lambda e: (effective_priority(e[0], e[1], now, self.aging_seconds), e[2])
+        )
+
+
+# =====================================================
+# MICRO-BATCHING INFERENCE SCHEDULER
+# =====================================================
+class BatchScheduler:
+    """
+    Collects frames submitted concurrently by request threads and runs
+    them through the model as a single batched forward pass.
+
+    A batch is closed as soon as it holds `max_batch_size` frames or
+    `max_wait_ms` has passed since its first frame arrived. Frames with
+    different (imgsz, conf) settings are never mixed in one forward pass.
+
+    Each batch is led by the highest (aged) priority frame waiting; it is
+    filled with compatible frames in priority order, so realtime work
+    overtakes queued batch work without starving it.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10, aging_seconds=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.aging_seconds = float(aging_seconds)
+
+        self._pending = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        # Stats
+        self.batches_run = 0
+        self.frames_run = 0
+        self.max_batch_seen = 0
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="inference-batcher",
+            daemon=True
+        )
+        self._thread.start()
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def submit(self, frame, imgsz, conf, priority="interactive"):
+        """Queue one frame; the returned Future resolves to its Results."""
+        future = Future()
+
+        with self._cond:
+            self._pending.append((
+                frame, imgsz, conf, future,
+                priority, priority_level(priority), time.monotonic(), next(self._seq)
+            ))
+            self._cond.notify()
+
+        return future
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._pending)
+            by_class = dict.fromkeys(PRIORITIES, 0)
+            for item in self._pending:
+                by_class[item[4]] = by_class.get(item[4], 0) + 1
+
+        return {
+            "queued": queued,
+            "queued_by_class": by_class,
+            "batches_run": self.batches_run,
+            "frames_run": self.frames_run,
+            "avg_batch_size": round(self.frames_run / self.batches_run, 2)
+            if self.batches_run else 0.0,
+            "max_batch_size": self.max_batch_seen
+        }
+
+    # -------------------------
+    # Worker loop
+    # -------------------------
+    def _collect(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_wait
+
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            now = time.monotonic()
+            self._pending.sort(
+                key=lambda item: (
+                    effective_priority(item[5], item[6], now, self.aging_seconds),
+                    item[7]
+                )
+            )
+
+            # Lead frame picks the settings; compatible frames join in order
+            key = (self._pending[0][1], self._pending[0][2])
+            batch, rest = [], []
+
+            for item in self._pending:
+                if len(batch) < self.max_batch_size and (item[1], item[2]) == key:
+                    batch.append(item)
+                else:
+                    rest.append(item)
+
+            self._pending = rest
+
+        for item in batch:
+            queue_wait_stats.record(item[4], now - item[6])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._run_group(batch, batch[0][1], batch[0][2])
+
+    def _run_group(self, items, imgsz, conf):
+        frames = [item[0] for item in items]
+
+        try:
+            results = self.predict_fn(frames, imgsz, conf, items[0][4])
+
+            for item, r in zip(items, results):
+                item[3].set_result(r)
+
+        except Exception as e:
+            logger.error(f"Batched inference error: {e}")
+
+            for item in items:
+                if not item[3].done():
+                    item[3].set_exception(e)
+
+        self.batches_run += 1
+        self.frames_run += len(items)
+        self.max_batch_seen = max(self.max_batch_seen, len(items))
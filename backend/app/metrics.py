@@ -0,0 +1,439 @@
+import sys
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond decode steps up to slow batch work
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# =====================================================
+# METRIC TYPES (MINIMAL PROMETHEUS CLIENT)
+# =====================================================
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+
+        for labels, value in items:
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. observe() is a bisect plus two adds
+    under a lock, cheap enough for every request stage.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(labels)
+
+            if series is None:
+                # Per-bucket (non-cumulative) counts + [sum, count]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+
+        for labels, counts, total, count in items:
+            cumulative = 0
+
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield (
+                    self.name + "_bucket",
+                    _labels(self.labelnames, labels, ("le", _number(float(bound)))),
+                    cumulative
+                )
+
+            yield self.name + "_sum", _labels(self.labelnames, labels), total
+            yield self.name + "_count", _labels(self.labelnames, labels), count
+
+
+class GaugeCallback:
+    """
+    Gauge (or counter) read from existing stats at scrape time, so the
+    hot path pays nothing. `fn()` returns {label_values_tuple: value}.
+    """
+
+    def __init__(self, name, help_text, fn, labelnames=(), kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self):
+        for labels, value in (self.fn() or {}).items():
+            if value is None:
+                continue
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+# =====================================================
+# REGISTRY + TEXT EXPOSITION
+# =====================================================
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name, help_text, fn, labelnames=(), kind="gauge"):
+        return self.register(GaugeCallback(name, help_text, fn, labelnames, kind))
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # A broken stats source must not take /metrics down
+                continue
+
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# =====================================================
+# REQUEST / STAGE INSTRUMENTATION
+# =====================================================
+stage_seconds = registry.histogram(
+    "rdd_stage_seconds",
+    "Time spent per processing stage of a detection request",
+    ("endpoint", "stage")
+)
+
+request_seconds = registry.histogram(
+    "rdd_http_request_seconds",
+    "HTTP request latency",
+    ("endpoint", "method", "status")
+)
+
+model_forward_seconds = registry.histogram(
+    "rdd_model_forward_seconds",
+    "Model forward pass latency (one batch)",
+    ("imgsz",)
+)
+
+batch_size = registry.histogram(
+    "rdd_inference_batch_size",
+    "Frames per forward pass",
+    buckets=BATCH_SIZE_BUCKETS
+)
+
+queue_wait_seconds = registry.histogram(
+    "rdd_inference_queue_wait_seconds",
+    "Time a frame waited for the model, per priority class",
+    ("priority",)
+)
+
+dashcam_frames = registry.counter(
+    "rdd_dashcam_frames_total",
+    "Dashcam frames received, by device and outcome",
+    ("device", "outcome")
+)
+
+_local = threading.local()
+
+
+def current_endpoint():
+    return getattr(_local, "endpoint", None) or "background"
+
+
+@contextmanager
+def stage(name):
+    """Time one stage of the current request: `with metrics.stage("imdecode"):`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, current_endpoint(), name)
+
+
+# =====================================================
+# SCRAPE-TIME GAUGES (EXISTING STATS OBJECTS)
+# =====================================================
+def _module(name):
+    # Never import at scrape time: a worker that hasn't loaded the ML
+    # stack reports nothing for it instead of paying for the import
+    return sys.modules.get(name)
+
+
+def _ml():
+    return _module("app.ml_utils")
+
+
+def _queue_depth():
+    ml = _ml()
+    if ml is None:
+        return {}
+
+    out = {("model_lock", "all"): ml.model_lock.waiting()}
+
+    if ml.scheduler is not None:
+        for priority, n in ml.scheduler.stats()["queued_by_class"].items():
+            out[("scheduler", priority)] = n
+
+    if ml.pool is not None:
+        out[("pool_slots", "all")] = ml.pool.stats()["waiting"]
+
+    return out
+
+
+def _pool_stats():
+    ml = _ml()
+    if ml is None or ml.pool is None:
+        return {}
+
+    stats = ml.pool.stats()
+    return {(key,): stats[key] for key in ("alive", "free_slots", "in_flight")}
+
+
+def _model_info():
+    ml = _ml()
+    if ml is None:
+        return {}
+
+    info = ml.model_info()
+    if info["version"] is None:
+        return {}
+
+    return {(info["version"], info["backend"] or "pool"): 1}
+
+
+def _gate_counts():
+    out = {}
+    dashcam = _module("app.dashcam")
+    ml = _ml()
+
+    if dashcam is not None and dashcam._frame_cache is not None:
+        stats = dashcam._frame_cache.stats()
+        out[("frame_cache", "hit")] = stats["hits"]
+        out[("frame_cache", "miss")] = stats["misses"]
+
+    if dashcam is not None and dashcam._motion_gate is not None:
+        stats = dashcam._motion_gate.stats()
+        out[("motion_gate", "analysed")] = stats["analysed"]
+        out[("motion_gate", "skipped")] = stats["skipped"]
+
+    if ml is not None:
+        cascade = ml.cascade_stats.stats()
+        out[("cascade", "screened")] = cascade["screened"]
+        out[("cascade", "escalated")] = cascade["escalated"]
+
+        quality = ml.quality_stats.stats().values()
+        out[("quality_gate", "checked")] = sum(e["checked"] for e in quality)
+        out[("quality_gate", "rejected")] = sum(e["rejected"] for e in quality)
+
+    return out
+
+
+def _admission():
+    admission = _module("app.admission")
+    controller = admission._controller if admission else None
+
+    if controller is None:
+        return {}
+
+    stats = controller.stats()
+    out = {("admitted",): stats["admitted"]}
+
+    for reason, n in stats["rejected"].items():
+        out[(f"rejected_{reason}",)] = n
+
+    return out
+
+
+def _video_jobs():
+    jobs = _module("app.video_jobs")
+    store = jobs._store if jobs else None
+
+    if store is None:
+        return {}
+
+    return {(status,): n for status, n in store.counts().items()}
+
+
+_collectors_registered = False
+
+
+def register_collectors():
+    global _collectors_registered
+
+    # Once per process, however many apps create_app() builds
+    if _collectors_registered:
+        return
+    _collectors_registered = True
+
+    registry.gauge_callback(
+        "rdd_inference_queue_depth",
+        "Frames waiting for the model, by queue and priority class",
+        _queue_depth,
+        ("queue", "priority")
+    )
+    registry.gauge_callback(
+        "rdd_inference_pool",
+        "Inference worker pool state",
+        _pool_stats,
+        ("state",)
+    )
+    registry.gauge_callback(
+        "rdd_model_info",
+        "Active model weights (value is always 1)",
+        _model_info,
+        ("version", "backend")
+    )
+    registry.gauge_callback(
+        "rdd_gate_events_total",
+        "Frame cache, motion gate, cascade and quality gate outcomes",
+        _gate_counts,
+        ("gate", "outcome"),
+        kind="counter"
+    )
+    registry.gauge_callback(
+        "rdd_admission_total",
+        "Admission control decisions",
+        _admission,
+        ("decision",),
+        kind="counter"
+    )
+    registry.gauge_callback(
+        "rdd_video_jobs",
+        "Video analysis jobs by status",
+        _video_jobs,
+        ("status",)
+    )
+
+
+def init_app(app):
+    """Per-request endpoint label for stage timings, plus request latency."""
+    from flask import request
+
+    register_collectors()
+
+    @app.before_request
+    def _start_timer():
+        _local.endpoint = request.endpoint or "unknown"
+        _local.started = time.perf_counter()
+        _local.status = None
+
+    @app.after_request
+    def _record_status(response):
+        _local.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _stop_timer(exc):
+        started = getattr(_local, "started", None)
+        endpoint = getattr(_local, "endpoint", None)
+        status = getattr(_local, "status", None)
+
+        _local.started = None
+        _local.endpoint = None
+
+        if started is None or endpoint == "main.metrics":
+            return
+
+        request_seconds.observe(
+            time.perf_counter() - started,
+            endpoint,
+            request.method,
+            str(status or 500)
+        )
@@ -0,0 +1,300 @@
+import os
+import glob
+import shutil
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("pytorch", "onnxruntime", "openvino")
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+# =====================================================
+# BACKEND RESOLUTION
+# =====================================================
+def resolve_weights(model_path, backend=None):
+    """
+    Return the weights artifact to load for the selected backend.
+
+    Exported artifacts are cached next to best.pt and rebuilt only when
+    best.pt is newer than the cached file. Any export failure falls back
+    to the original PyTorch weights so inference keeps working.
+    """
+    backend = (backend or Config.INFERENCE_BACKEND).lower()
+
+    if backend not in BACKENDS:
+        logger.error(f"Unknown inference backend '{backend}', using pytorch")
+        return model_path
+
+    if backend == "pytorch":
+        return model_path
+
+    try:
+        # Workers that all see a new best.pt export it once: the first
+        # one builds the artifact, the others find it fresh
+        with _export_lock(model_path):
+            if backend == "onnxruntime":
+                return _onnx_artifact(model_path)
+            return _openvino_artifact(model_path)
+
+    except Exception as e:
+        logger.error(f"{backend} export failed, falling back to pytorch: {e}")
+        return model_path
+
+
+_local_export_lock = threading.Lock()
+
+
+@contextmanager
+def _export_lock(model_path):
+    """Exclusive lock (across processes) on the artifacts of `model_path`."""
+    if fcntl is None:
+        with _local_export_lock:
+            yield
+        return
+
+    with open(os.path.splitext(model_path)[0] + ".export.lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _is_fresh(artifact, source):
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+
+# =====================================================
+# ONNX RUNTIME
+# =====================================================
+def _onnx_artifact(model_path):
+    from ultralytics import YOLO
+
+    stem = os.path.splitext(model_path)[0]
+    fp32_path = stem + ".onnx"
+    int8_path = stem + ".int8.onnx"
+
+    if not _is_fresh(fp32_path, model_path):
+        logger.info(f"Exporting {model_path} to ONNX")
+        YOLO(model_path).export(
+            format="onnx",
+            imgsz=640,
+            dynamic=True,
+            simplify=True
+        )
+
+    if not Config.INFERENCE_INT8:
+        return fp32_path
+
+    if not _is_fresh(int8_path, fp32_path):
+        try:
+            _quantize_onnx(fp32_path, int8_path)
+        except Exception as e:
+            logger.error(f"INT8 quantization failed, using FP32 ONNX: {e}")
+            return fp32_path
+
+    return int8_path
+
+
+def _quantize_onnx(fp32_path, int8_path):
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static
+    )
+
+    samples = load_calibration_samples()
+
+    if not samples:
+        raise RuntimeError("No calibration images found for INT8 quantization")
+
+    input_name = ort.InferenceSession(
+        fp32_path,
+        providers=["CPUExecutionProvider"]
+    ).get_inputs()[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(samples)
+
+        def get_next(self):
+            sample = next(self._it, None)
+            return None if sample is None else {input_name: sample}
+
+    logger.info(f"Quantizing {fp32_path} to INT8 with {len(samples)} calibration images")
+
+    tmp_path = int8_path + ".tmp"
+
+    quantize_static(
+        fp32_path,
+        tmp_path,
+        _Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+
+    # Ultralytics reads class names / stride from the ONNX metadata
+    src = onnx.load(fp32_path)
+    dst = onnx.load(tmp_path)
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, tmp_path)
+
+    os.replace(tmp_path, int8_path)
+    logger.info(f"INT8 ONNX model written to {int8_path}")
+
+
+# =====================================================
+# OPENVINO
+# =====================================================
+def _openvino_artifact(model_path):
+    from ultralytics import YOLO
+
+    stem = os.path.splitext(model_path)[0]
+    fp32_dir = stem + "_openvino_model"
+    int8_dir = stem + "_int8_openvino_model"
+    fp32_xml = os.path.join(fp32_dir, os.path.basename(stem) + ".xml")
+    int8_xml = os.path.join(int8_dir, os.path.basename(stem) + ".xml")
+
+    if not _is_fresh(fp32_xml, model_path):
+        logger.info(f"Exporting {model_path} to OpenVINO")
+        YOLO(model_path).export(
+            format="openvino",
+            imgsz=640,
+            dynamic=True
+        )
+
+    if not Config.INFERENCE_INT8:
+        return fp32_dir
+
+    if not _is_fresh(int8_xml, fp32_xml):
+        try:
+            _quantize_openvino(fp32_dir, fp32_xml, int8_dir, int8_xml)
+        except Exception as e:
+            logger.error(f"INT8 quantization failed, using FP32 OpenVINO: {e}")
+            return fp32_dir
+
+    return int8_dir
+
+
+def _quantize_openvino(fp32_dir, fp32_xml, int8_dir, int8_xml):
+    import nncf
+    import openvino as ov
+
+    samples = load_calibration_samples()
+
+    if not samples:
+        raise RuntimeError("No calibration images found for INT8 quantization")
+
+    logger.info(f"Quantizing {fp32_xml} to INT8 with {len(samples)} calibration images")
+
+    ov_model = ov.Core().read_model(fp32_xml)
+
+    quantized = nncf.quantize(
+        ov_model,
+        nncf.Dataset(samples),
+        preset=nncf.QuantizationPreset.MIXED,
+        subset_size=len(samples)
+    )
+
+    tmp_dir = int8_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ov.save_model(
+        quantized,
+        os.path.join(tmp_dir, os.path.basename(int8_xml)),
+        compress_to_fp16=False
+    )
+
+    # Ultralytics reads class names / stride from metadata.yaml
+    metadata = os.path.join(fp32_dir, "metadata.yaml")
+    if os.path.exists(metadata):
+        shutil.copy(metadata, tmp_dir)
+
+    shutil.rmtree(int8_dir, ignore_errors=True)
+    os.replace(tmp_dir, int8_dir)
+    logger.info(f"INT8 OpenVINO model written to {int8_dir}")
+
+
+# =====================================================
+# CALIBRATION DATA
+# =====================================================
+def _letterbox(image, size):
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+
+    resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - nh) // 2
+    left = (size - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+
+    return canvas
+
+
+def load_calibration_samples(image_dir=None, limit=None, imgsz=None):
+    """
+    Build model-ready calibration tensors (1x3xHxW float32, RGB, 0..1)
+    from images already uploaded to the server.
+    """
+    image_dir = image_dir or Config.INFERENCE_CALIBRATION_DIR
+    limit = limit or Config.INFERENCE_CALIBRATION_SAMPLES
+    imgsz = imgsz or Config.INFERENCE_CALIBRATION_IMGSZ
+
+    paths = sorted(
+        p for p in glob.glob(os.path.join(image_dir, "*"))
+        if p.lower().endswith(IMAGE_EXTS)
+    )[:limit]
+
+    samples = []
+
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+
+        image = _letterbox(image, imgsz)
+        tensor = image[:, :, ::-1].transpose(2, 0, 1)
+        tensor = np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+
+        samples.append(tensor[None])
+
+    return samples
+
+
+# =====================================================
+# CLI: ONE-TIME EXPORT
+# =====================================================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Export best.pt for a CPU inference backend")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnxruntime")
+    parser.add_argument("--weights", default=None)
+    args = parser.parse_args()
+
+    backend_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    weights = args.weights or os.path.join(os.path.dirname(backend_dir), "model", "best.pt")
+
+    print(resolve_weights(weights, args.backend))
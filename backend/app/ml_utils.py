@@ -1,96 +1,731 @@
 import os
+import json
 import logging
 import base64
 import cv2
+import time
+import hashlib
+import threading
+from collections import deque
 import numpy as np
-import torch
-from ultralytics import YOLO
+from config import Config
+from app.inference_scheduler import BatchScheduler, PriorityGate, queue_wait_stats
+from app.ml_backends import resolve_weights
+from app.inference_pool import InferencePool
+from app.detections import Detections, BAD_LABELS
+from app.frame_io import read_image
+from app import cpu_topology
+from app import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 model = None
+model_backend = None
+model_version = None
+
+# Serialises forward passes on the shared model; waiters are served
+# realtime > interactive > batch, with aging
+model_lock = PriorityGate(1, aging_seconds=Config.INFERENCE_PRIORITY_AGING_SECONDS)
+
+scheduler = None
+_scheduler_lock = threading.Lock()
+
+pool = None
+_pool_lock = threading.Lock()
 
 
 # =====================================================
 # LOAD MODEL (OPTIMIZED)
 # =====================================================
-def load_model():
-    global model
+_load_lock = threading.Lock()
 
-    if model is not None:
-        return
+# Set once the model is loaded and warmed at every INFERENCE_WARMUP_SIZES
+model_ready = threading.Event()
+
+MODEL_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(os.path.dirname(os.path.dirname(__file__)))),
+    "model"
+)
+DEFAULT_WEIGHTS = os.path.join(MODEL_DIR, "best.pt")
+
+# Name of the weights file every process should serve (written by
+# /api/official/model/reload); best.pt when absent
+ACTIVE_WEIGHTS_FILE = os.path.join(MODEL_DIR, "ACTIVE")
 
+
+def active_weights():
+    """Weights file published as active for the whole deployment."""
     try:
-        backend_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-        root_dir = os.path.dirname(backend_dir)
-        model_path = os.path.join(root_dir, "model", "best.pt")
+        with open(ACTIVE_WEIGHTS_FILE) as f:
+            name = os.path.basename(f.read().strip())
+    except OSError:
+        return DEFAULT_WEIGHTS
+
+    path = os.path.join(MODEL_DIR, name)
+
+    if not name or not os.path.isfile(path):
+        logger.warning(f"Active weights '{name}' not found, using {os.path.basename(DEFAULT_WEIGHTS)}")
+        return DEFAULT_WEIGHTS
+
+    return path
+
+
+def publish_active_weights(path):
+    """
+    Make `path` (inside model/) the active weights of every process:
+    each weights watcher swaps to it on its next poll.
+    """
+    tmp = f"{ACTIVE_WEIGHTS_FILE}.{os.getpid()}.tmp"
+
+    with open(tmp, "w") as f:
+        f.write(os.path.basename(path) + "\n")
+
+    os.replace(tmp, ACTIVE_WEIGHTS_FILE)
 
-        if not os.path.exists(model_path):
-            logger.error(f"YOLO model not found at {model_path}")
-            return
 
-        logger.info(f"Loading YOLO model from {model_path}")
+def weights_version(path):
+    """Content hash of a weights file (first 12 hex digits of SHA-256)."""
+    digest = hashlib.sha256()
 
-        model = YOLO(model_path)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()[:12]
+
+
+def _build_model(model_path):
+    """
+    Load and warm a model for `model_path` without touching the active
+    one. Returns (model, backend, version).
+    """
+    # torch / ultralytics are imported here, on first use, so processes
+    # that never run inference (auth, listings, files) never load them
+    import torch
+    from ultralytics import YOLO
+
+    # This process's thread budget (default: every allowed core)
+    cpu_topology.current_layout()
+    cpu_topology.configure_libraries()
+
+    version = weights_version(model_path)
+
+    # Exported ONNX / OpenVINO artifact when configured, else the .pt file
+    weights_path = resolve_weights(model_path)
+
+    logger.info(f"Loading YOLO model {version} from {weights_path}")
+
+    yolo = YOLO(weights_path, task="detect")
+
+    if weights_path == model_path:
+        backend = "pytorch"
 
         # Fuse layers for speed
-        model.fuse()
+        yolo.fuse()
 
         # GPU optimization
         if torch.cuda.is_available():
-            model.to("cuda")
+            yolo.to("cuda")
             logger.info("Using GPU acceleration")
         else:
             logger.info("Using CPU inference")
+    else:
+        backend = Config.INFERENCE_BACKEND.lower()
+        logger.info(f"Using {backend} CPU inference")
+
+        if backend == "onnxruntime":
+            # The ORT session is created on the first call; rebuild it
+            # with this worker's thread budget before the real warmup
+            size = Config.INFERENCE_WARMUP_SIZES[0] if Config.INFERENCE_WARMUP_SIZES else 320
+            yolo(np.zeros((size, size, 3), dtype=np.uint8), imgsz=size, verbose=False)
+            cpu_topology.tune_onnx_session(yolo, weights_path)
+
+    # Warmup at every serving size (dashcam 320, citizen / video 640),
+    # so no first request pays for graph / buffer setup
+    for size in Config.INFERENCE_WARMUP_SIZES:
+        dummy = np.zeros((size, size, 3), dtype=np.uint8)
+        yolo(dummy, imgsz=size, verbose=False)
+
+    logger.info(f"YOLO model {version} loaded and warmed up at {list(Config.INFERENCE_WARMUP_SIZES)}")
 
-        # Warmup (reduces first inference delay)
-        dummy = np.zeros((320, 320, 3), dtype=np.uint8)
-        model(dummy, imgsz=320, verbose=False)
+    return yolo, backend, version
 
-        logger.info("YOLO model loaded and warmed up")
+
+def load_model():
+    if model is not None:
+        return
+
+    with _load_lock:
+        if model is None:
+            _load_model()
+
+
+def _load_model():
+    global model, model_backend, model_version
+
+    model_path = registry["weights"] or active_weights()
+
+    if not os.path.exists(model_path):
+        logger.error(f"YOLO model not found at {model_path}")
+        return
+
+    try:
+        signature = _weights_signature(model_path)
+        model, model_backend, model_version = _build_model(model_path)
+
+        registry.update(weights=model_path, signature=signature, loaded_at=time.time())
+        model_ready.set()
 
     except Exception as e:
         logger.error(f"Error loading YOLO model: {e}")
         model = None
+        model_backend = None
+        model_version = None
+        return
 
 
 # =====================================================
-# IMAGE DETECTION (FILE PATH)
+# MODEL REGISTRY (HOT SWAP WITH PRE-WARMED STANDBY)
 # =====================================================
-def detect_damage(image_path):
+registry = {
+    "weights": None,        # active weights file
+    "signature": None,      # (path, mtime_ns, size) it was loaded from
+    "loaded_at": None,
+    "swapping": False,
+    "last_error": None,
+    "history": deque(maxlen=10)
+}
+
+_swap_lock = threading.Lock()
+_watcher_pid = None
+
+
+def _weights_signature(path):
+    st = os.stat(path)
+    return path, st.st_mtime_ns, st.st_size
+
+
+def swap_model(weights_path=None):
+    """
+    Load `weights_path` (default: re-read the active weights file) into a
+    standby model and warm it while the current model keeps serving, then
+    swap it in. The swap takes the model lock like a realtime request, so
+    it only waits for the forward pass in flight; queued requests run on
+    the new model. Video streams already started finish on the old one.
+    Returns the new version, or None if the standby failed to load.
+    """
+    global model, model_backend, model_version
+
+    path = weights_path or registry["weights"] or DEFAULT_WEIGHTS
+
+    with _swap_lock:
+        registry["swapping"] = True
+
+        try:
+            signature = _weights_signature(path)
+            standby = _build_model(path)
+
+        except Exception as e:
+            logger.error(f"Model swap to {path} failed, keeping {model_version}: {e}")
+            registry["last_error"] = f"{os.path.basename(path)}: {e}"
+            return None
+
+        finally:
+            registry["swapping"] = False
+
+        with model_lock.hold("realtime", record=False):
+            previous = model_version
+            model, model_backend, model_version = standby
+
+        registry.update(weights=path, signature=signature, loaded_at=time.time(), last_error=None)
+        registry["history"].append({
+            "from": previous,
+            "to": model_version,
+            "weights": os.path.basename(path),
+            "at": registry["loaded_at"]
+        })
+
+        model_ready.set()
+
+    logger.info(f"Model swapped {previous} -> {model_version}")
+
+    return model_version
+
+
+def _watch_weights():
+    """
+    Poll the active weights file; once a new file has been stable for one
+    interval (copy finished), hot-swap it in. A file that failed to load is
+    not retried until it changes again.
+    """
+    pending = None
+    failed = None
+
+    while True:
+        time.sleep(Config.MODEL_WATCH_SECONDS)
+
+        # Follows the deployment-wide active file (reloads by name reach
+        # every worker), and replacements of that file in place
+        path = active_weights()
+
+        try:
+            signature = _weights_signature(path)
+        except OSError:
+            continue
+
+        # Nothing loaded yet: a lazy first load reads the current file
+        if model is None:
+            continue
+
+        if signature in (registry["signature"], failed) or registry["swapping"]:
+            pending = None
+            continue
+
+        if signature != pending:
+            pending = signature
+            continue
+
+        pending = None
+
+        if swap_model(path) is None:
+            failed = signature
+
+
+def start_model_watcher():
+    """
+    Start this process's weights watcher (once; threads don't survive a
+    fork). Only serving processes call this: create_app(), gunicorn's
+    post_fork and the inference pool workers.
+    """
+    global _watcher_pid
+
+    if Config.MODEL_WATCH_SECONDS <= 0 or _watcher_pid == os.getpid():
+        return
+
+    _watcher_pid = os.getpid()
+
+    threading.Thread(
+        target=_watch_weights,
+        name="model-watcher",
+        daemon=True
+    ).start()
+
+
+def model_info():
+    """Active version / backend / swap state (stats, readiness, officials)."""
+    workers = pool
 
-    global model
+    return {
+        "version": model_version if workers is None else workers.model_version,
+        "backend": model_backend,
+        "weights": os.path.basename(registry["weights"]) if registry["weights"] else None,
+        "loaded_at": registry["loaded_at"],
+        "swapping": registry["swapping"],
+        "last_error": registry["last_error"],
+        "history": list(registry["history"])
+    }
+
+
+_local = threading.local()
+
+
+def last_model_version():
+    """Version of the model behind this thread's most recent detection."""
+    return getattr(_local, "model_version", None)
+
+
+# =====================================================
+# INFERENCE ENTRY POINT (BATCHED OR DIRECT)
+# =====================================================
+def _tag(results, version):
+    # Which weights produced each result (the model may be hot-swapped)
+    for r in results:
+        r.model_version = version
+    return results
+
+
+def _forward(frames, imgsz, conf):
+    # Caller holds model_lock
+    metrics.batch_size.observe(len(frames) if isinstance(frames, list) else 1)
+
+    with metrics.model_forward_seconds.time(str(imgsz)):
+        return _tag(model(frames, imgsz=imgsz, conf=conf, verbose=False), model_version)
+
+
+def _predict_batch(frames, imgsz, conf, priority="interactive"):
+    with model_lock.hold(priority):
+        return _forward(frames, imgsz, conf)
+
+
+def _predict_queued(frames, imgsz, conf, priority):
+    # Queue wait was already recorded by the scheduler
+    with model_lock.hold(priority, record=False):
+        return _forward(frames, imgsz, conf)
+
+
+def get_scheduler():
+    """Return the shared batch scheduler, or None if batching is disabled."""
+    global scheduler
+
+    if not Config.INFERENCE_BATCHING:
+        return None
+
+    if scheduler is None:
+        with _scheduler_lock:
+            if scheduler is None:
+                scheduler = BatchScheduler(
+                    _predict_queued,
+                    max_batch_size=Config.INFERENCE_BATCH_MAX_SIZE,
+                    max_wait_ms=Config.INFERENCE_BATCH_MAX_WAIT_MS,
+                    aging_seconds=Config.INFERENCE_PRIORITY_AGING_SECONDS
+                )
+                logger.info(
+                    f"Batch scheduler started "
+                    f"(max_batch={scheduler.max_batch_size}, "
+                    f"max_wait={Config.INFERENCE_BATCH_MAX_WAIT_MS}ms)"
+                )
+
+    return scheduler
+
+
+def _predict(frame, imgsz, conf=0.25, priority="interactive"):
+    """Run one frame through the model and return its Results object."""
+    batcher = get_scheduler()
+
+    if batcher is not None:
+        return batcher.submit(frame, imgsz, conf, priority).result()
+
+    return _predict_batch(frame, imgsz, conf, priority)[0]
+
+
+# =====================================================
+# MULTI-PROCESS WORKER POOL
+# =====================================================
+def get_pool():
+    """Return the shared worker pool, or None if inference runs in-process."""
+    global pool
+
+    if Config.INFERENCE_WORKERS <= 0:
+        return None
+
+    if pool is None:
+        with _pool_lock:
+            if pool is None:
+                pool = InferencePool(
+                    Config.INFERENCE_WORKERS,
+                    slots=Config.INFERENCE_RING_SLOTS,
+                    slot_bytes=Config.INFERENCE_SLOT_BYTES,
+                    max_batch=Config.INFERENCE_BATCH_MAX_SIZE,
+                    aging_seconds=Config.INFERENCE_PRIORITY_AGING_SECONDS
+                )
+                logger.info(
+                    f"Inference pool started "
+                    f"(workers={pool.workers}, slots={pool.slots})"
+                )
+
+    return pool
+
+
+def _infer_in_pool(workers, frame, imgsz, conf, priority):
+    # Frames larger than a ring slot are downscaled; imgsz <= 640 anyway
+    scale = 1.0
+    shape = frame.shape
+
+    if not workers.fits(frame):
+        h, w = frame.shape[:2]
+        scale = (workers.slot_bytes / frame.nbytes) ** 0.5
+        frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
+
+    rows, version = workers.infer(np.ascontiguousarray(frame), imgsz, conf=conf, priority=priority)
+
+    # Boxes are scaled back below, so they belong to the original shape
+    detections = Detections.from_array(rows, workers.names, shape, version)
+
+    if scale != 1.0:
+        detections.xyxy /= scale
+
+    return detections
+
+
+# =====================================================
+# STRUCTURED DETECTION (SHARED POST-PROCESSING)
+# =====================================================
+def ensure_model():
+    """Make sure some inference path is available. Returns False on failure."""
+    if get_pool() is not None:
+        return True
 
     if model is None:
         load_model()
 
-    if model is None:
-        return "Model Error", 0.0
+    return model is not None
 
-    if not os.path.exists(image_path):
-        return "Image Not Found", 0.0
+
+def detect(frame, imgsz=640, conf=0.25, priority="interactive"):
+    """
+    Run detection on a BGR frame and return a Detections object with all
+    boxes, confidences and class ids in `frame` pixel coordinates.
+    `priority` is the queue class: realtime, interactive or batch.
+    """
+    workers = get_pool()
+
+    with metrics.stage("inference"):
+        if workers is not None:
+            detections = _infer_in_pool(workers, frame, imgsz, conf, priority)
+        else:
+            detections = Detections.from_result(_predict(frame, imgsz, conf, priority))
+
+    _local.model_version = detections.model_version
+
+    return detections
+
+
+def inference_ready():
+    """True once some inference path is loaded and warm (readiness probe)."""
+    if pool is not None:
+        return pool.ready()
+
+    return model_ready.is_set()
+
+
+def inference_queue_stats():
+    """Per-class queue waits plus the depth of whichever queue is active."""
+    batcher = scheduler
+    workers = pool
+
+    return {
+        "waits": queue_wait_stats.stats(),
+        "model_waiting": model_lock.waiting(),
+        "scheduler": batcher.stats() if batcher else None,
+        "pool": workers.stats() if workers else None
+    }
+
+
+def encode_b64_jpeg(image, quality):
+    with metrics.stage("jpeg_encode"):
+        _, buf = cv2.imencode(
+            ".jpg",
+            image,
+            [cv2.IMWRITE_JPEG_QUALITY, quality]
+        )
+
+    with metrics.stage("b64_encode"):
+        return base64.b64encode(buf).decode("utf-8")
+
+
+# =====================================================
+# FRAME QUALITY GATE (NO MODEL)
+# =====================================================
+def check_frame_quality(frame):
+    """
+    Cheap usability check on a downscaled grayscale copy of a frame.
+    Returns a list of reason codes; an empty list means the frame is usable.
+
+      blurry       : Laplacian variance below QUALITY_MIN_SHARPNESS
+      underexposed : too many near-black pixels (night, lens cap)
+      overexposed  : too many clipped highlights (glare, sun)
+      occluded     : almost no contrast (covered lens, fogged windshield)
+    """
+    with metrics.stage("quality_gate"):
+        h, w = frame.shape[:2]
+        width = min(w, Config.QUALITY_THUMB_WIDTH)
+        small = cv2.resize(frame, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+        hist = np.bincount(gray.ravel(), minlength=256) / gray.size
+        reasons = []
+
+        if hist[:Config.QUALITY_DARK_LEVEL].sum() > Config.QUALITY_MAX_DARK_FRACTION:
+            reasons.append("underexposed")
+
+        if hist[Config.QUALITY_BRIGHT_LEVEL:].sum() > Config.QUALITY_MAX_BRIGHT_FRACTION:
+            reasons.append("overexposed")
+
+        if gray.std() < Config.QUALITY_MIN_CONTRAST:
+            reasons.append("occluded")
+
+        elif cv2.Laplacian(gray, cv2.CV_32F).var() < Config.QUALITY_MIN_SHARPNESS:
+            reasons.append("blurry")
+
+        return reasons
+
+
+class QualityStats:
+    """Per-source counters of frames checked / rejected by the quality gate."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+
+    def record(self, source_id, reasons):
+        with self._lock:
+            entry = self._sources.setdefault(
+                source_id,
+                {"checked": 0, "rejected": 0, "reasons": {}}
+            )
+            entry["checked"] += 1
+
+            if reasons:
+                entry["rejected"] += 1
+                for reason in reasons:
+                    entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                source_id: dict(
+                    entry,
+                    reasons=dict(entry["reasons"]),
+                    rejection_rate=round(entry["rejected"] / entry["checked"], 3)
+                )
+                for source_id, entry in self._sources.items()
+            }
+
+
+quality_stats = QualityStats()
+
+
+# =====================================================
+# TWO-STAGE CASCADE (TINY GATE MODEL -> best.pt)
+# =====================================================
+gate_model = None
+_gate_lock = threading.Lock()
+_gate_missing = False
+
+
+def load_gate_model():
+    """Load the cheap screening model (classifier or nano detector) once."""
+    global gate_model, _gate_missing
+
+    if gate_model is not None or _gate_missing:
+        return gate_model
+
+    with _gate_lock:
+        if gate_model is not None or _gate_missing:
+            return gate_model
+
+        path = Config.CASCADE_GATE_MODEL
+
+        if not os.path.exists(path):
+            logger.warning(f"Cascade gate model not found at {path}; cascade disabled")
+            _gate_missing = True
+            return None
+
+        try:
+            from ultralytics import YOLO
+
+            gate_model = YOLO(path)
+            logger.info(f"Cascade gate model loaded from {path} (task={gate_model.task})")
+        except Exception as e:
+            logger.error(f"Error loading cascade gate model: {e}")
+            _gate_missing = True
+
+    return gate_model
+
+
+def gate_score(frame):
+    """
+    Probability-like score that the frame contains damage.
+    Classifier: 1 - P(negative class), or top-1 confidence if there is no
+    negative class. Detector: highest box confidence.
+    """
+    with _gate_lock:
+        r = gate_model(frame, imgsz=Config.CASCADE_GATE_IMGSZ, conf=0.05, verbose=False)[0]
+
+    if r.probs is not None:
+        probs = r.probs.data.cpu().numpy()
+        negatives = [i for i, n in r.names.items() if n.lower() in Config.CASCADE_NEGATIVE_CLASSES]
+
+        if negatives:
+            return float(1.0 - probs[negatives].sum())
+        return float(probs.max())
+
+    if r.boxes is None or not len(r.boxes):
+        return 0.0
+
+    return float(r.boxes.conf.max())
+
+
+class CascadeStats:
+    """Escalation rate and per-stage latency of the cascade."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.screened = 0
+        self.escalated = 0
+        self.gate_ms = 0.0
+        self.full_ms = 0.0
+
+    def record_gate(self, ms, escalated):
+        with self._lock:
+            self.screened += 1
+            self.escalated += int(escalated)
+            self.gate_ms += ms
+
+    def record_full(self, ms):
+        with self._lock:
+            self.full_ms += ms
+
+    def stats(self):
+        with self._lock:
+            return {
+                "gate_loaded": gate_model is not None,
+                "screened": self.screened,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.screened, 3) if self.screened else 0.0,
+                "avg_gate_ms": round(self.gate_ms / self.screened, 2) if self.screened else 0.0,
+                "avg_full_ms": round(self.full_ms / self.escalated, 2) if self.escalated else 0.0
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+def cascade_enabled(endpoint):
+    """Cascade mode is switched on per endpoint (CASCADE_ENDPOINTS)."""
+    return endpoint in Config.CASCADE_ENDPOINTS
+
+
+def _escalate(frame):
+    """Run the gate stage. Fails open (escalates) if the gate is unavailable."""
+    if load_gate_model() is None:
+        return True
+
+    start = time.perf_counter()
 
     try:
+        escalated = gate_score(frame) >= Config.CASCADE_GATE_THRESHOLD
+    except Exception as e:
+        logger.error(f"Cascade gate error: {e}")
+        return True
+
+    cascade_stats.record_gate((time.perf_counter() - start) * 1000, escalated)
+    return escalated
+
+
+# =====================================================
+# IMAGE DETECTION (FILE PATH)
+# =====================================================
+def detect_damage(image_path):
 
-        results = model(image_path, imgsz=640, conf=0.25, verbose=False)
+    _local.model_version = None
 
-        best_class = "No Damage"
-        best_conf = 0.0
+    if not ensure_model():
+        return "Model Error", 0.0
 
-        for r in results:
-            if r.boxes is not None and len(r.boxes):
+    if not os.path.exists(image_path):
+        return "Image Not Found", 0.0
 
-                for box in r.boxes:
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    class_name = model.names[cls_id]
+    try:
 
-                    if conf > best_conf:
-                        best_conf = conf
-                        best_class = class_name
+        frame = read_image(image_path, target_size=640)
 
-        return best_class, best_conf
+        if frame is None:
+            return "Image Not Found", 0.0
+
+        # Re-inference of a submitted report; yields to live traffic
+        return detect(frame, imgsz=640, priority="batch").best()
 
     except Exception as e:
         logger.error(f"Detection error: {e}")
@@ -100,14 +735,16 @@ def detect_damage(image_path):
 # =====================================================
 # IMAGE DETECTION + ANNOTATED IMAGE
 # =====================================================
-def detect_damage_with_image(image_input):
-
-    global model
+def detect_damage_with_image(image_input, cascade=False, boxes_only=False, priority="interactive"):
+    """
+    Returns (damage_type, confidence, annotation). The annotation is a
+    base64 annotated JPEG, or with `boxes_only` the normalised box list
+    from Detections.to_boxes() (no rendering / encoding on the server).
+    """
 
-    if model is None:
-        load_model()
+    _local.model_version = None
 
-    if model is None:
+    if not ensure_model():
         return "Model Error", 0.0, None
 
     try:
@@ -120,40 +757,34 @@ def detect_damage_with_image(image_input):
             if not os.path.exists(image_input):
                 return "Image Not Found", 0.0, None
 
-            frame = cv2.imread(image_input)
+            frame = read_image(image_input, target_size=640)
 
         else:
             frame = image_input
 
-        results = model(frame, imgsz=640, conf=0.25, verbose=False)
-
-        best_class = "No Damage"
-        best_conf = 0.0
-        annotated_b64 = None
+        if frame is None:
+            return "Image Not Found", 0.0, None
 
-        for r in results:
+        if cascade and not _escalate(frame):
+            return "No Damage", 0.0, [] if boxes_only else None
 
-            if r.boxes is not None and len(r.boxes):
+        start = time.perf_counter()
+        detections = detect(frame, imgsz=640, priority=priority)
+        best_class, best_conf = detections.best()
 
-                for box in r.boxes:
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    class_name = model.names[cls_id]
+        if cascade:
+            cascade_stats.record_full((time.perf_counter() - start) * 1000)
 
-                    if conf > best_conf:
-                        best_conf = conf
-                        best_class = class_name
+        if boxes_only:
+            return best_class, best_conf, detections.to_boxes()
 
-                # Annotate only if detection exists
-                annotated_bgr = r.plot()
-
-                _, buf = cv2.imencode(
-                    ".jpg",
-                    annotated_bgr,
-                    [cv2.IMWRITE_JPEG_QUALITY, 80]
-                )
+        # Annotate only if detection exists
+        annotated_b64 = None
+        if len(detections):
+            with metrics.stage("render"):
+                annotated = detections.render(frame)
 
-                annotated_b64 = base64.b64encode(buf).decode("utf-8")
+            annotated_b64 = encode_b64_jpeg(annotated, 80)
 
         return best_class, best_conf, annotated_b64
 
@@ -165,153 +796,297 @@ def detect_damage_with_image(image_input):
 # =====================================================
 # FAST REALTIME FRAME DETECTION
 # =====================================================
-def detect_damage_with_frame(frame):
-
-    global model
-
-    if model is None:
-        load_model()
-
-    if model is None:
+DEFAULT_FRAME_PROFILE = {
+    "roi": None,
+    "imgsz": 320,
+    "conf": 0.25,
+    "resize_mode": "resize"
+}
+
+ANNOTATED_MAX_WIDTH = 640
+
+
+def crop_roi(frame, roi):
+    """
+    Crop a frame to a normalised ROI: [x1, y1, x2, y2] rectangle or
+    [[x, y], ...] polygon (pixels outside the polygon are greyed out).
+    Returns (crop, (offset_x, offset_y)).
+    """
+    if not roi:
+        return frame, (0, 0)
+
+    h, w = frame.shape[:2]
+
+    if len(roi) == 4 and not isinstance(roi[0], (list, tuple)):
+        pts = np.array([[roi[0], roi[1]], [roi[2], roi[3]]], dtype=np.float32)
+        polygon = None
+    else:
+        pts = np.array(roi, dtype=np.float32)
+        polygon = pts
+
+    pts = pts * np.array([w, h], dtype=np.float32)
+    x1, y1 = np.floor(pts.min(axis=0)).astype(int).clip(0)
+    x2, y2 = np.ceil(pts.max(axis=0)).astype(int)
+    x2, y2 = min(x2, w), min(y2, h)
+
+    crop = frame[y1:y2, x1:x2]
+
+    if polygon is not None:
+        mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [np.round(pts - [x1, y1]).astype(np.int32)], 255)
+        crop = crop.copy()
+        crop[mask == 0] = 114
+
+    return crop, (int(x1), int(y1))
+
+
+def detect_damage_with_frame(frame, cascade=False, profile=None, boxes_only=False,
+                             priority="realtime"):
+    """
+    Realtime detection with an optional per-device profile:
+    ROI crop, imgsz, confidence threshold and resize vs. letterbox.
+    Boxes are mapped back to full-frame coordinates for annotation, or
+    returned as normalised full-frame boxes with `boxes_only`.
+    """
+    _local.model_version = None
+
+    if not ensure_model():
         return "Model Error", 0.0, None
 
-    try:
+    profile = dict(DEFAULT_FRAME_PROFILE, **(profile or {}))
+    imgsz = profile["imgsz"]
 
-        # Resize for speed
-        frame_small = cv2.resize(frame, (320, 320))
+    try:
 
-        results = model(frame_small, imgsz=320, conf=0.25, verbose=False)
+        with metrics.stage("resize"):
+            # Only the road region is sent to the model
+            crop, (offset_x, offset_y) = crop_roi(frame, profile["roi"])
+            crop_h, crop_w = crop.shape[:2]
+
+            if profile["resize_mode"] == "letterbox":
+                # YOLO letterboxes internally; keeps road geometry undistorted
+                model_input = crop
+            else:
+                # Resize for speed
+                model_input = cv2.resize(crop, (imgsz, imgsz))
+
+        # Cheap gate model screens out negative frames
+        if cascade and not _escalate(model_input):
+            return "No Damage", 0.0, [] if boxes_only else None
+
+        start = time.perf_counter()
+        detections = detect(model_input, imgsz=imgsz, conf=profile["conf"], priority=priority)
+        best_class, best_conf = detections.best()
+
+        if cascade:
+            cascade_stats.record_full((time.perf_counter() - start) * 1000)
+
+        input_h, input_w = model_input.shape[:2]
+
+        if boxes_only:
+            mapped = detections.transform(
+                crop_w / input_w,
+                crop_h / input_h,
+                offset_x,
+                offset_y,
+                frame.shape
+            )
+            return best_class, best_conf, mapped.to_boxes()
 
-        best_class = "No Damage"
-        best_conf = 0.0
         annotated_b64 = None
+        if len(detections):
+
+            with metrics.stage("render"):
+                # Map boxes back to (display-sized) full-frame coordinates
+                h, w = frame.shape[:2]
+                view_scale = min(1.0, ANNOTATED_MAX_WIDTH / w)
+                view = frame if view_scale == 1.0 else cv2.resize(
+                    frame,
+                    (int(w * view_scale), int(h * view_scale))
+                )
 
-        for r in results:
+                mapped = detections.transform(
+                    crop_w / input_w * view_scale,
+                    crop_h / input_h * view_scale,
+                    offset_x * view_scale,
+                    offset_y * view_scale,
+                    view.shape
+                )
 
-            if r.boxes is not None and len(r.boxes):
+                annotated = mapped.render(view)
 
-                for box in r.boxes:
+            annotated_b64 = encode_b64_jpeg(annotated, 70)
 
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    class_name = model.names[cls_id]
+        return best_class, best_conf, annotated_b64
 
-                    if conf > best_conf:
-                        best_conf = conf
-                        best_class = class_name
+    except Exception as e:
+        logger.error(f"Realtime detection error: {e}")
+        return "Detection Error", 0.0, None
 
-                annotated = r.plot()
 
-                _, buf = cv2.imencode(
-                    ".jpg",
-                    annotated,
-                    [cv2.IMWRITE_JPEG_QUALITY, 70]
-                )
+# =====================================================
+# ON-DEMAND ANNOTATION (STORED REPORT IMAGES)
+# =====================================================
+def render_annotated_file(src_path, dst_path, quality=85, priority="interactive"):
+    """
+    Re-run detection on a stored image and write the annotated JPEG to
+    `dst_path`. Used when an official opens a report, so realtime
+    responses never pay for rendering. Returns True on success.
+    """
+    if not ensure_model():
+        return False
 
-                annotated_b64 = base64.b64encode(buf).decode("utf-8")
+    frame = read_image(src_path)
 
-        return best_class, best_conf, annotated_b64
+    if frame is None:
+        return False
 
+    try:
+        annotated = detect(frame, imgsz=640, priority=priority).render(frame)
     except Exception as e:
-        logger.error(f"Realtime detection error: {e}")
-        return "Detection Error", 0.0, None
+        logger.error(f"Annotation error: {e}")
+        return False
+
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+
+    return cv2.imwrite(dst_path, annotated, [cv2.IMWRITE_JPEG_QUALITY, quality])
 
 
 # =====================================================
 # VIDEO DETECTION (GPU STREAM)
 # =====================================================
-def detect_video_full(video_path):
+def _video_summary(counts, conf_sum):
+    return [
+        {
+            "damage_type": dt,
+            "count": counts[dt],
+            "avg_confidence": round(conf_sum[dt] / counts[dt], 3)
+        }
+        for dt in sorted(counts, key=lambda x: -counts[x])
+    ]
+
 
-    global model
+def video_frame_count(video_path):
+    """Frame count from the container header (0 if unknown)."""
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+class VideoTimeline:
+    """
+    Optional per-frame timeline streamed to disk as NDJSON
+    ({"frame", "damage_type", "confidence"} per line), so it never
+    accumulates in memory. A no-op when `path` is None.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, "w", buffering=1 << 16) if path else None
+
+    def write(self, frame, damage_type, confidence):
+        if self._file:
+            self._file.write(
+                f'{{"frame": {frame}, "damage_type": {json.dumps(damage_type)}, '
+                f'"confidence": {confidence}}}\n'
+            )
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def detect_video_full(video_path, progress=None, progress_interval=1.0, timeline_path=None):
+    """
+    Analyse every frame of a video in constant memory: the summary is
+    built from running per-class counters, the per-frame timeline is only
+    written to `timeline_path` (NDJSON) when given, and the best frame is
+    kept raw and rendered / encoded once at the end.
+
+    `progress(frames_done, frames_total, partial)` is called at most every
+    `progress_interval` seconds with the summary so far; it may raise to
+    abort (e.g. job cancellation).
+    """
 
     if model is None:
         load_model()
 
-    if model is None:
+    # Pinned for the whole video: a hot swap mid-stream doesn't mix models
+    video_model, version = model, model_version
+
+    if video_model is None:
         raise RuntimeError("Model not loaded")
 
     if not os.path.exists(video_path):
         raise FileNotFoundError(video_path)
 
-    BAD_LABELS = {"No Damage", "Model Error", "Detection Error", "Image Not Found"}
-
-    frame_results = []
-    best_frame_b64 = None
     best_conf = 0
+    best_frame = None
+    best_detections = None
     total_frames = 0
 
-    try:
+    # Running per-class counters (partial summaries while the job runs)
+    counts = {}
+    conf_sum = {}
 
-        for r in model(video_path, stream=True, verbose=False):
+    frames_expected = video_frame_count(video_path) if progress else 0
+    last_report = time.monotonic()
 
-            total_frames += 1
+    timeline = VideoTimeline(timeline_path)
 
-            best_class = "No Damage"
-            frame_conf = 0
+    try:
 
-            if r.boxes is not None and len(r.boxes):
+        frames = video_model(video_path, stream=True, verbose=False)
 
-                for box in r.boxes:
+        while True:
 
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    name = model.names[cls_id]
+            # One frame per model turn, so realtime work can cut in between
+            with model_lock.hold("batch"):
+                r = next(frames, None)
 
-                    if conf > frame_conf:
-                        frame_conf = conf
-                        best_class = name
+            if r is None:
+                break
 
-            frame_results.append({
-                "frame": total_frames,
-                "damage_type": best_class,
-                "confidence": round(frame_conf, 3)
-            })
+            total_frames += 1
 
-            if best_class not in BAD_LABELS and frame_conf > best_conf:
+            detections = Detections.from_result(r)
+            best_class, frame_conf = detections.best()
+            frame_conf = round(frame_conf, 3)
 
-                best_conf = frame_conf
+            timeline.write(total_frames, best_class, frame_conf)
 
-                annotated = r.plot()
+            if best_class not in BAD_LABELS:
+                counts[best_class] = counts.get(best_class, 0) + 1
+                conf_sum[best_class] = conf_sum.get(best_class, 0) + frame_conf
 
-                _, buf = cv2.imencode(
-                    ".jpg",
-                    annotated,
-                    [cv2.IMWRITE_JPEG_QUALITY, 85]
-                )
+                if frame_conf > best_conf:
+                    best_conf = frame_conf
+                    best_frame = r.orig_img.copy()
+                    best_detections = detections
 
-                best_frame_b64 = base64.b64encode(buf).decode("utf-8")
+            if progress and time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                progress(total_frames, frames_expected, _video_summary(counts, conf_sum))
 
     except Exception as e:
         logger.error(f"Video detection error: {e}")
         raise
 
-    # Build summary
-    counts = {}
-    conf_sum = {}
-
-    for r in frame_results:
-
-        dt = r["damage_type"]
-
-        if dt in BAD_LABELS:
-            continue
-
-        counts[dt] = counts.get(dt, 0) + 1
-        conf_sum[dt] = conf_sum.get(dt, 0) + r["confidence"]
+    finally:
+        timeline.close()
 
-    summary = [
-        {
-            "damage_type": dt,
-            "count": counts[dt],
-            "avg_confidence": round(conf_sum[dt] / counts[dt], 3)
-        }
-        for dt in sorted(counts, key=lambda x: -counts[x])
-    ]
+    summary = _video_summary(counts, conf_sum)
 
     return {
         "total_frames": total_frames,
         "detections_found": sum(counts.values()),
         "summary": summary,
         "top_damage": summary[0]["damage_type"] if summary else "No Damage",
-        "best_annotated_frame": best_frame_b64
-    }
\ No newline at end of file
+        "best_annotated_frame": encode_b64_jpeg(best_detections.render(best_frame), 85)
+        if best_frame is not None else None,
+        "model_version": version
+    }
@@ -52,6 +52,32 @@ class Device(db.Model):
     )
 
 
+# =====================================================
+# DEVICE INFERENCE PROFILE (DASHCAM DEVICES)
+# =====================================================
+class DeviceProfile(db.Model):
+    __tablename__ = 'device_profiles'
+    __bind_key__ = 'infra_auth_db'   # same DB as devices
+
+    # Device.id (the dashcam JWT identity)
+    device_id = db.Column(db.String(36), primary_key=True)
+
+    # JSON, normalised 0..1 coords: [x1, y1, x2, y2] or [[x, y], ...] polygon
+    roi = db.Column(db.Text, nullable=True)
+
+    imgsz = db.Column(db.Integer, nullable=False, default=320)
+    conf_threshold = db.Column(db.Float, nullable=False, default=0.25)
+
+    resize_mode = db.Column(db.String(10), nullable=False, default='resize')
+    # resize | letterbox
+
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
+
+
 # =====================================================
 # DAMAGE REPORT MODEL (DAMAGE DB)
 # =====================================================
@@ -77,6 +103,9 @@ class DamageReport(db.Model):
     detected_damage_type = db.Column(db.String(50))
     confidence_score = db.Column(db.Float)
 
+    # Weights that produced the detection (content hash, see ml_utils.weights_version)
+    model_version = db.Column(db.String(32), nullable=True)
+
     status = db.Column(
         db.String(20),
         default='submitted'
@@ -96,6 +125,32 @@ class DamageReport(db.Model):
     )
 
 
+# Columns added after the table was first created: create_all() only
+# creates missing tables, so existing databases get them here
+ADDED_COLUMNS = {
+    DamageReport: {"model_version": "VARCHAR(32)"}
+}
+
+
+def upgrade_schema():
+    """Add ADDED_COLUMNS missing from existing tables (needs an app context)."""
+    from sqlalchemy import inspect, text
+
+    for model, columns in ADDED_COLUMNS.items():
+        engine = db.engines[model.__bind_key__]
+        inspector = inspect(engine)
+
+        if not inspector.has_table(model.__tablename__):
+            continue
+
+        existing = {c["name"] for c in inspector.get_columns(model.__tablename__)}
+
+        with engine.begin() as conn:
+            for name, kind in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN {name} {kind}"))
+
+
 # =====================================================
 # WORK REPORT MODEL (WORK DB)
 # =====================================================
@@ -1,4 +1,5 @@
-from flask import Blueprint, render_template, current_app
+import hmac
+from flask import Blueprint, render_template, current_app, jsonify, request, Response
 
 main_bp = Blueprint("main", __name__)
 
@@ -6,3 +7,53 @@ main_bp = Blueprint("main", __name__)
 def landing():
     # Ensure index.html exists in templates
     return render_template("index.html")
+
+
+# =====================================================
+# 🩺 LIVENESS / READINESS (LOAD BALANCER PROBES)
+# =====================================================
+@main_bp.route("/healthz")
+def healthz():
+    return jsonify({"status": "ok"}), 200
+
+
+@main_bp.route("/readyz")
+def readyz():
+    """
+    503 until this worker can serve without a cold start. Workers that
+    load the model lazily (INFERENCE_PRELOAD off) are ready at once.
+    """
+    if not current_app.config.get("INFERENCE_PRELOAD"):
+        return jsonify({"status": "ready", "inference": "lazy"}), 200
+
+    from app import ml_utils
+
+    if not ml_utils.inference_ready():
+        return jsonify({"status": "warming"}), 503
+
+    return jsonify({
+        "status": "ready",
+        "inference": ml_utils.model_backend or "pool",
+        "model_version": ml_utils.model_info()["version"],
+        "warmup_sizes": list(current_app.config["INFERENCE_WARMUP_SIZES"])
+    }), 200
+
+
+# =====================================================
+# 📈 PROMETHEUS METRICS
+# =====================================================
+@main_bp.route("/metrics")
+def metrics():
+    """Text exposition of this worker's metrics (one scrape target per process)."""
+    if not current_app.config.get("METRICS_ENABLED"):
+        return jsonify({"msg": "Metrics disabled"}), 404
+
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth.encode(), f"Bearer {token}".encode()):
+            return jsonify({"msg": "Invalid metrics token"}), 401
+
+    from app.metrics import registry
+
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
+HEAVY_MODULES = ("torch", "ultralytics", "cv2", "numpy", "pdfplumber")
+
+# Each scenario runs in a fresh interpreter so import caches don't leak
+SCENARIOS = {
+    "create_app": "from app import create_app; create_app()",
+    "create_app+login": (
+        "from app import create_app; app = create_app(); "
+        "app.test_client().post('/api/auth/login', json={})"
+    ),
+    "create_app+load_model": (
+        "from app import create_app, ml_utils; create_app(); ml_utils.load_model()"
+    ),
+}
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - t0
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+except ImportError:
+    rss_mb = None
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_mb": rss_mb,
+    "loaded": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+# =====================================================
+# STARTUP BENCHMARK
+# =====================================================
+def run_scenario(code, env=None):
+    """Time `code` in a fresh interpreter; returns seconds, peak RSS and heavy modules loaded."""
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, **(env or {})),
+        capture_output=True,
+        text=True
+    )
+
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "failed"}
+
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark(names, repeat=3, env=None):
+    results = {}
+
+    for name in names:
+        runs = [run_scenario(SCENARIOS[name], env) for _ in range(repeat)]
+        ok = [r for r in runs if "error" not in r]
+
+        if not ok:
+            results[name] = runs[0]
+            continue
+
+        results[name] = {
+            "best_seconds": round(min(r["seconds"] for r in ok), 3),
+            "max_rss_mb": round(max(r["max_rss_mb"] or 0 for r in ok), 1) or None,
+            "loaded": ok[0]["loaded"]
+        }
+
+    return results
+
+
+# =====================================================
+# CLI
+# =====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure web worker start-up time / memory and which ML modules get imported"
+    )
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--preload", action="store_true", help="run with INFERENCE_PRELOAD=1")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = benchmark(
+        args.scenario or list(SCENARIOS),
+        repeat=max(1, args.repeat),
+        env={"INFERENCE_PRELOAD": "1"} if args.preload else None
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            if "error" in r:
+                print(f"{name:24s} ERROR {r['error']}")
+            else:
+                print(
+                    f"{name:24s} {r['best_seconds']:7.3f}s  "
+                    f"{r['max_rss_mb'] or 0:7.1f} MB  "
+                    f"loaded: {', '.join(r['loaded']) or '-'}"
+                )
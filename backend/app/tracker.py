@@ -0,0 +1,128 @@
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes."""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+# =====================================================
+# LIGHTWEIGHT IOU TRACKER (KEYFRAME VIDEO MODE)
+# =====================================================
+class IoUTracker:
+    """
+    Associates detections across keyframes so each physical damage is
+    counted once. Boxes are normalised xyxy; each track predicts its next
+    box with constant velocity (road damage drifts down the frame as the
+    vehicle approaches) and is matched greedily by IoU within its class.
+    Tracks unseen for `max_missed` keyframes are closed.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=3, min_hits=1):
+        self.iou_threshold = float(iou_threshold)
+        self.max_missed = int(max_missed)
+        self.min_hits = int(min_hits)
+
+        self._active = []
+        self._closed = []
+        self._next_id = 0
+
+    def update(self, boxes, confs, labels, frame_index):
+        """Feed one keyframe's detections (normalised (N, 4) boxes)."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+        predicted = np.array(
+            [t["box"] + t["velocity"] for t in self._active],
+            dtype=np.float32
+        ).reshape(-1, 4)
+
+        ious = iou_matrix(predicted, boxes)
+
+        # Same-class pairs only
+        for i, track in enumerate(self._active):
+            for j, label in enumerate(labels):
+                if track["label"] != label:
+                    ious[i, j] = 0.0
+
+        matched_tracks, matched_dets = set(), set()
+
+        for flat in np.argsort(-ious, axis=None):
+            i, j = np.unravel_index(flat, ious.shape)
+
+            if ious[i, j] < self.iou_threshold:
+                break
+            if i in matched_tracks or j in matched_dets:
+                continue
+
+            track = self._active[i]
+            track["velocity"] = boxes[j] - track["box"]
+            track["box"] = boxes[j]
+            track["hits"] += 1
+            track["missed"] = 0
+            track["last_frame"] = frame_index
+            track["best_conf"] = max(track["best_conf"], float(confs[j]))
+
+            matched_tracks.add(i)
+            matched_dets.add(j)
+
+        still_active = []
+        for i, track in enumerate(self._active):
+            if i not in matched_tracks:
+                track["missed"] += 1
+
+            if track["missed"] > self.max_missed:
+                self._closed.append(track)
+            else:
+                still_active.append(track)
+
+        for j in range(len(boxes)):
+            if j in matched_dets:
+                continue
+
+            still_active.append({
+                "id": self._next_id,
+                "label": labels[j],
+                "box": boxes[j],
+                "velocity": np.zeros(4, dtype=np.float32),
+                "hits": 1,
+                "missed": 0,
+                "first_frame": frame_index,
+                "last_frame": frame_index,
+                "best_conf": float(confs[j])
+            })
+            self._next_id += 1
+
+        self._active = still_active
+
+    def tracks(self):
+        """All confirmed tracks (closed and still active)."""
+        return [t for t in self._closed + self._active if t["hits"] >= self.min_hits]
+
+    def summary(self):
+        """Per-class unique damage counts, same shape as the video `summary`."""
+        counts, conf_sum = {}, {}
+
+        for t in self.tracks():
+            counts[t["label"]] = counts.get(t["label"], 0) + 1
+            conf_sum[t["label"]] = conf_sum.get(t["label"], 0.0) + t["best_conf"]
+
+        return [
+            {
+                "damage_type": label,
+                "count": counts[label],
+                "avg_confidence": round(conf_sum[label] / counts[label], 3)
+            }
+            for label in sorted(counts, key=lambda x: -counts[x])
+        ]
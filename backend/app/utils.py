@@ -1,6 +1,20 @@
 from .models import db, AuditLog
 from flask import request
 
+# Report images that already carry boxes (dashcam sessions store the
+# frame the client was shown) are tagged in the file name and served
+# as stored, instead of being re-annotated
+PRE_ANNOTATED_SUFFIX = ".annotated.jpg"
+
+
+def report_image_name(stem, annotated):
+    return stem + (PRE_ANNOTATED_SUFFIX if annotated else ".jpg")
+
+
+def is_pre_annotated(filename):
+    return filename.endswith(PRE_ANNOTATED_SUFFIX)
+
+
 def log_audit(user_id, action):
     try:
         log = AuditLog(user_id=user_id, action=action, ip_address=request.remote_addr)
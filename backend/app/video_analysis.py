@@ -0,0 +1,397 @@
+import os
+import time
+import shutil
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+import numpy as np
+from config import Config
+from app import ml_utils
+from app.detections import BAD_LABELS
+from app.tracker import IoUTracker
+
+logger = logging.getLogger(__name__)
+
+VIDEO_MODES = ("full", "keyframe", "sharded")
+
+THUMB_SIZE = (64, 36)
+
+
+def _thumbnail(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def _version_label(versions):
+    """Model version(s) behind a video result; several if it was hot-swapped mid-video."""
+    return ",".join(sorted(v for v in versions if v)) or None
+
+
+# =====================================================
+# KEYFRAME MODE (STRIDE / SCENE CHANGE + TRACKER)
+# =====================================================
+def detect_video_keyframes(video_path, progress=None, progress_interval=1.0,
+                           stride=None, probe_stride=None, scene_threshold=None,
+                           timeline_path=None):
+    """
+    Run the detector on keyframes only:
+      - every `stride` frames, or
+      - earlier, when a probe frame (decoded every `probe_stride` frames)
+        differs from the last keyframe by >= `scene_threshold`
+    All other frames are skipped with grab() (no decode). Detections are
+    linked across keyframes by IoUTracker, so `summary` counts unique
+    damages rather than per-frame hits. The optional timeline (one line
+    per keyframe) is streamed to `timeline_path`.
+    """
+    stride = max(1, int(stride or Config.VIDEO_KEYFRAME_STRIDE))
+    probe_stride = max(1, int(probe_stride or Config.VIDEO_SCENE_PROBE_STRIDE))
+    scene_threshold = float(scene_threshold or Config.VIDEO_SCENE_THRESHOLD)
+
+    if not ml_utils.ensure_model():
+        raise RuntimeError("Model not loaded")
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(video_path)
+
+    frames_expected = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+    tracker = IoUTracker(
+        iou_threshold=Config.VIDEO_TRACK_IOU,
+        max_missed=Config.VIDEO_TRACK_MAX_MISSED
+    )
+
+    total_frames = 0
+    keyframes = 0
+    last_key = -stride
+    last_thumb = None
+    last_report = time.monotonic()
+
+    best_conf = 0.0
+    best_frame = None
+    best_detections = None
+    versions = set()
+
+    timeline = ml_utils.VideoTimeline(timeline_path)
+
+    try:
+        while cap.grab():
+
+            index = total_frames
+            total_frames += 1
+
+            due = index - last_key >= stride
+            probe = index % probe_stride == 0
+
+            if not (due or probe):
+                continue
+
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+
+            thumb = _thumbnail(frame)
+
+            if not due:
+                # Probe frame: only a scene change promotes it to a keyframe
+                diff = float(np.mean(cv2.absdiff(thumb, last_thumb))) if last_thumb is not None else 255.0
+                if diff < scene_threshold:
+                    continue
+
+            last_key = index
+            last_thumb = thumb
+            keyframes += 1
+
+            detections = ml_utils.detect(frame, imgsz=640, priority="batch")
+            versions.add(detections.model_version)
+
+            h, w = frame.shape[:2]
+            tracker.update(
+                detections.xyxy / np.array([w, h, w, h], dtype=np.float32),
+                detections.conf,
+                [detections.label(c) for c in detections.cls],
+                index
+            )
+
+            best_class, frame_conf = detections.best()
+            timeline.write(index + 1, best_class, round(frame_conf, 3))
+
+            # Keep the raw frame; encode once at the end
+            if best_class not in BAD_LABELS and frame_conf > best_conf:
+                best_conf = frame_conf
+                best_frame = frame
+                best_detections = detections
+
+            if progress and time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                progress(total_frames, frames_expected, tracker.summary())
+
+    finally:
+        cap.release()
+        timeline.close()
+
+    summary = tracker.summary()
+
+    return {
+        "mode": "keyframe",
+        "total_frames": total_frames,
+        "keyframes_analysed": keyframes,
+        "detections_found": sum(s["count"] for s in summary),
+        "summary": summary,
+        "top_damage": summary[0]["damage_type"] if summary else "No Damage",
+        "best_annotated_frame": ml_utils.encode_b64_jpeg(
+            best_detections.render(best_frame), 85
+        ) if best_frame is not None else None,
+        "model_version": _version_label(versions)
+    }
+
+
+# =====================================================
+# SHARDED MODE (TIME SEGMENTS ACROSS PROCESSES)
+# =====================================================
+def _init_shard_worker(counter, workers, thread_budget):
+    from app import cpu_topology
+
+    # One in-process model per shard worker; no nested pools / batcher
+    Config.INFERENCE_WORKERS = 0
+    Config.INFERENCE_BATCHING = False
+
+    # Slots are handed out in start order; replacements wrap around
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+
+    # The shards share the job worker's thread budget, not the machine
+    layouts = cpu_topology.plan_layout(workers)
+    layout = layouts[slot % len(layouts)]
+    cpu_topology.apply_layout(dict(layout, threads=min(layout["threads"], max(1, thread_budget // workers))))
+    ml_utils.load_model()
+
+
+def _segment_part_path(timeline_path, start):
+    return f"{timeline_path}.part{start:010d}"
+
+
+def _analyse_segment(video_path, start, end, timeline_path=None):
+    """
+    Every frame in [start, end). Returns counters and the rendered best
+    frame; the segment's timeline goes to its own part file, if requested.
+    """
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    counts, conf_sum = {}, {}
+    timeline = ml_utils.VideoTimeline(
+        _segment_part_path(timeline_path, start) if timeline_path else None
+    )
+    best_conf, best_index, best_frame, best_detections = 0.0, None, None, None
+    versions = set()
+
+    index = start
+
+    try:
+        while index < end:
+            ok, frame = cap.read()
+            if not ok:
+                break
+
+            detections = ml_utils.detect(frame, imgsz=640, priority="batch")
+            versions.add(detections.model_version)
+            label, conf = detections.best()
+            conf = round(conf, 3)
+
+            timeline.write(index + 1, label, conf)
+
+            if label not in BAD_LABELS:
+                counts[label] = counts.get(label, 0) + 1
+                conf_sum[label] = conf_sum.get(label, 0.0) + conf
+
+                if conf > best_conf:
+                    best_conf, best_index = conf, index
+                    best_frame, best_detections = frame, detections
+
+            index += 1
+
+    finally:
+        cap.release()
+        timeline.close()
+
+    return {
+        "start": start,
+        "frames": index - start,
+        "counts": counts,
+        "conf_sum": conf_sum,
+        "best_conf": best_conf,
+        "best_index": best_index,
+        # Rendered once per segment, not on every new best
+        "best_frame": best_detections.render(best_frame) if best_frame is not None else None,
+        "model_versions": sorted(v for v in versions if v)
+    }
+
+
+def _merge_timeline_parts(timeline_path, starts):
+    """Concatenate the segment part files in frame order, then remove them."""
+    with open(timeline_path, "wb") as out:
+        for start in sorted(starts):
+            part = _segment_part_path(timeline_path, start)
+
+            if not os.path.exists(part):
+                continue
+
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+            os.remove(part)
+
+
+def _remove_timeline_parts(timeline_path, starts):
+    for start in starts:
+        try:
+            os.remove(_segment_part_path(timeline_path, start))
+        except OSError:
+            pass
+
+
+_shard_executor = None
+_shard_lock = threading.Lock()
+
+
+def get_shard_executor():
+    """Process pool kept for the life of the job worker (model loaded once)."""
+    global _shard_executor
+
+    with _shard_lock:
+        if _shard_executor is None:
+            from app import cpu_topology
+
+            # Cores this process may use (affinity / cgroup quota), as
+            # reduced for video job workers: one model copy per budgeted core
+            budget = cpu_topology.current_layout()["threads"]
+            workers = Config.VIDEO_SHARD_WORKERS or budget
+
+            ctx = mp.get_context("spawn")
+
+            _shard_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=ctx,
+                initializer=_init_shard_worker,
+                initargs=(ctx.Value("i", 0), workers, budget)
+            )
+            _shard_executor.workers = workers
+
+    return _shard_executor
+
+
+def detect_video_sharded(video_path, progress=None, timeline_path=None):
+    """
+    Split the video into time segments (by frame seek), analyse them in
+    parallel worker processes and merge: per-class summary recomputed from
+    the segment counters, global best frame encoded once, and the optional
+    per-frame timeline (one part file per segment) concatenated in frame
+    order into `timeline_path`.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(video_path)
+
+    frames_expected = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if frames_expected <= 0:
+        # Unknown length (no seekable index): fall back to one sequential pass
+        return dict(
+            ml_utils.detect_video_full(video_path, progress=progress, timeline_path=timeline_path),
+            mode="full"
+        )
+
+    executor = get_shard_executor()
+
+    # More segments than workers: balances uneven segments, finer progress
+    segment_count = min(frames_expected, executor.workers * Config.VIDEO_SHARDS_PER_WORKER)
+    bounds = np.linspace(0, frames_expected, segment_count + 1).astype(int)
+
+    starts = [int(a) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    pending = {
+        executor.submit(_analyse_segment, video_path, int(a), int(b), timeline_path)
+        for a, b in zip(bounds[:-1], bounds[1:]) if b > a
+    }
+
+    counts, conf_sum = {}, {}
+    versions = set()
+    total_frames = 0
+    best = (0.0, None, None)  # conf, frame index, rendered frame
+
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                seg = future.result()
+
+                total_frames += seg["frames"]
+                versions.update(seg["model_versions"])
+
+                for label, n in seg["counts"].items():
+                    counts[label] = counts.get(label, 0) + n
+                    conf_sum[label] = conf_sum.get(label, 0.0) + seg["conf_sum"][label]
+
+                # Highest confidence wins; earliest frame on ties
+                if seg["best_index"] is not None and (
+                    seg["best_conf"] > best[0]
+                    or (seg["best_conf"] == best[0] and seg["best_index"] < best[1])
+                ):
+                    best = (seg["best_conf"], seg["best_index"], seg["best_frame"])
+
+            if progress:
+                progress(total_frames, frames_expected, ml_utils._video_summary(counts, conf_sum))
+
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        if timeline_path:
+            _remove_timeline_parts(timeline_path, starts)
+        raise
+
+    if timeline_path:
+        _merge_timeline_parts(timeline_path, starts)
+
+    summary = ml_utils._video_summary(counts, conf_sum)
+
+    return {
+        "mode": "sharded",
+        "total_frames": total_frames,
+        "segments": len(bounds) - 1,
+        "detections_found": sum(counts.values()),
+        "summary": summary,
+        "top_damage": summary[0]["damage_type"] if summary else "No Damage",
+        "best_frame_index": best[1],
+        "model_version": _version_label(versions),
+        "best_annotated_frame": ml_utils.encode_b64_jpeg(best[2], 85)
+        if best[2] is not None else None
+    }
+
+
+# =====================================================
+# ENTRY POINT (JOB WORKERS)
+# =====================================================
+def analyse_video(video_path, mode=None, progress=None, timeline_path=None):
+    """
+    Analyse a video in `mode` (full / keyframe / sharded; default from
+    config). The per-frame timeline is streamed to `timeline_path` (NDJSON)
+    when given, never held in memory.
+    """
+    mode = mode if mode in VIDEO_MODES else Config.VIDEO_ANALYSIS_MODE
+
+    if mode == "keyframe":
+        return detect_video_keyframes(video_path, progress=progress, timeline_path=timeline_path)
+
+    if mode == "sharded":
+        return detect_video_sharded(video_path, progress=progress, timeline_path=timeline_path)
+
+    return dict(
+        ml_utils.detect_video_full(video_path, progress=progress, timeline_path=timeline_path),
+        mode="full"
+    )
@@ -0,0 +1,432 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import logging
+import threading
+import multiprocessing as mp
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# =====================================================
+# SQLITE JOB TABLE
+# =====================================================
+class JobStore:
+    """
+    Video analysis jobs in a local SQLite file, shared by the web process
+    and the job workers. Every call opens its own short-lived connection,
+    so the store is safe to use from any thread or process.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_jobs (
+                    id TEXT PRIMARY KEY,
+                    owner_id TEXT NOT NULL,
+                    video_path TEXT NOT NULL,
+                    meta TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    frames_done INTEGER NOT NULL DEFAULT 0,
+                    frames_total INTEGER NOT NULL DEFAULT 0,
+                    partial TEXT,
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker_pid INTEGER,
+                    heartbeat_at REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+            # Tables created before job ownership was tracked
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(video_jobs)")}
+            for column, kind in (("worker_pid", "INTEGER"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE video_jobs ADD COLUMN {column} {kind}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_video_jobs_status "
+                "ON video_jobs (status, created_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit; claim() opens its own IMMEDIATE transaction
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # -------------------------
+    # Web side
+    # -------------------------
+    def create(self, owner_id, video_path, meta=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO video_jobs (id, owner_id, video_path, meta, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, str(owner_id), video_path, json.dumps(meta or {}), now, now)
+            )
+
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM video_jobs WHERE id = ?", (job_id,)).fetchone()
+
+        return dict(row) if row else None
+
+    def request_cancel(self, job_id):
+        """Queued jobs are cancelled at once; running ones at the next progress tick."""
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE video_jobs SET status = 'cancelled', updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, job_id)
+            )
+            conn.execute(
+                "UPDATE video_jobs SET cancel_requested = 1, updated_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (now, job_id)
+            )
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM video_jobs GROUP BY status"
+            ).fetchall()
+
+        out = dict.fromkeys(JOB_STATUSES, 0)
+        out.update({row["status"]: row["n"] for row in rows})
+        return out
+
+    # -------------------------
+    # Worker side
+    # -------------------------
+    def claim(self, worker_pid):
+        """Atomically move the oldest queued job to running, owned by `worker_pid`. Returns it or None."""
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+
+            row = conn.execute(
+                "SELECT * FROM video_jobs WHERE status = 'queued' "
+                "ORDER BY created_at LIMIT 1"
+            ).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE video_jobs SET status = 'running', worker_pid = ?, heartbeat_at = ?, "
+                "started_at = ?, updated_at = ? WHERE id = ?",
+                (worker_pid, now, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+
+        return dict(row)
+
+    def progress(self, job_id, worker_pid, frames_done, frames_total, partial):
+        """
+        Store progress; returns True if the job should stop (cancellation
+        requested, or the job was requeued and is no longer ours).
+        """
+        now = time.time()
+
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE video_jobs SET frames_done = ?, frames_total = ?, partial = ?, "
+                "heartbeat_at = ?, updated_at = ? "
+                "WHERE id = ? AND worker_pid = ? AND status = 'running'",
+                (frames_done, frames_total, json.dumps(partial), now, now, job_id, worker_pid)
+            )
+            if cur.rowcount != 1:
+                return True
+
+            row = conn.execute(
+                "SELECT cancel_requested FROM video_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+        return bool(row and row["cancel_requested"])
+
+    def heartbeat(self, job_id, worker_pid):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE video_jobs SET heartbeat_at = ? "
+                "WHERE id = ? AND worker_pid = ? AND status = 'running'",
+                (time.time(), job_id, worker_pid)
+            )
+
+    def finish(self, job_id, worker_pid, status, result=None, error=None):
+        # Ignored if the job was requeued meanwhile: its new owner reports
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE video_jobs SET status = ?, result = ?, error = ?, updated_at = ?, "
+                "frames_done = COALESCE(?, frames_done) "
+                "WHERE id = ? AND worker_pid = ? AND status = 'running'",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    result.get("total_frames") if result else None,
+                    job_id,
+                    worker_pid
+                )
+            )
+
+    def requeue_stale(self, stale_seconds):
+        """
+        Running jobs whose owner stopped heartbeating (crashed / killed
+        worker) go back to the queue. Jobs other live workers are
+        processing are left alone.
+        """
+        now = time.time()
+
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE video_jobs SET status = 'queued', worker_pid = NULL, "
+                "cancel_requested = 0, frames_done = 0, updated_at = ? "
+                "WHERE status = 'running' AND COALESCE(heartbeat_at, updated_at) < ?",
+                (now, now - stale_seconds)
+            )
+
+        return cur.rowcount
+
+
+def timeline_path_for(job):
+    """NDJSON per-frame timeline written next to the job's video."""
+    return os.path.splitext(job["video_path"])[0] + ".timeline.ndjson"
+
+
+def job_to_dict(job):
+    """Public view of a job row: progress, ETA, partial / final summary."""
+    done = job["frames_done"]
+    total = job["frames_total"]
+
+    eta = None
+    if job["status"] == "running" and job["started_at"] and done and total > done:
+        rate = done / max(1e-6, job["updated_at"] - job["started_at"])
+        eta = round((total - done) / rate, 1)
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "frames_processed": done,
+        "frames_total": total,
+        "progress": round(done / total, 3) if total else None,
+        "eta_seconds": eta,
+        "partial_summary": json.loads(job["partial"]) if job["partial"] else [],
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "timeline_url": f"/api/video/jobs/{job['id']}/timeline"
+        if job["status"] == "done" and os.path.exists(timeline_path_for(job)) else None,
+        "error": job["error"],
+        "cancel_requested": bool(job["cancel_requested"]),
+        "created_at": job["created_at"]
+    }
+
+
+# =====================================================
+# WORKER PROCESS
+# =====================================================
+def _run_job(store, job):
+    from config import Config
+    from app.video_analysis import analyse_video
+
+    pid = os.getpid()
+    meta = json.loads(job["meta"] or "{}")
+    timeline_path = timeline_path_for(job) if Config.VIDEO_TIMELINE_ENABLED else None
+
+    def progress(frames_done, frames_total, partial):
+        if store.progress(job["id"], pid, frames_done, frames_total, partial):
+            raise JobCancelled()
+
+    try:
+        result = analyse_video(
+            job["video_path"],
+            mode=meta.get("mode"),
+            progress=progress,
+            timeline_path=timeline_path
+        )
+        store.finish(job["id"], pid, "done", result=result)
+        logger.info(f"Video job {job['id']} done ({result['total_frames']} frames)")
+
+    except JobCancelled:
+        store.finish(job["id"], pid, "cancelled")
+        logger.info(f"Video job {job['id']} cancelled")
+
+    except Exception as e:
+        store.finish(job["id"], pid, "failed", error=str(e))
+        logger.error(f"Video job {job['id']} failed: {e}")
+
+
+def _heartbeat(store, current, interval, parent_pid):
+    # Keeps the running job owned between (possibly sparse) progress ticks
+    while True:
+        time.sleep(interval)
+
+        if os.getppid() != parent_pid:
+            # Web process killed (SIGKILL skips its atexit cleanup): stop,
+            # the job goes stale and another worker requeues it
+            logger.warning("Video job worker orphaned, exiting")
+            os._exit(1)
+
+        job_id = current.get("job_id")
+        if job_id:
+            store.heartbeat(job_id, os.getpid())
+
+
+def _lower_priority():
+    """Video jobs yield the CPU to realtime requests of the web process."""
+    from config import Config
+    from app import cpu_topology
+
+    if hasattr(os, "nice") and Config.VIDEO_JOB_NICE > 0:
+        try:
+            os.nice(Config.VIDEO_JOB_NICE)
+        except OSError as e:
+            logger.warning(f"Could not lower video job priority: {e}")
+
+    layout = cpu_topology.plan_layout(1)[0]
+    threads = Config.VIDEO_JOB_THREADS or max(1, layout["threads"] // 2)
+
+    cpu_topology.apply_layout(dict(layout, threads=min(threads, layout["threads"])), pin=False)
+
+
+def _worker_main(db_path, poll_interval):
+    """Claim and run queued jobs until the parent (web process) goes away."""
+    from config import Config
+
+    logging.basicConfig(level=logging.INFO)
+
+    parent_pid = os.getppid()
+
+    # In-process model only, as in the shard workers: no inference pool or
+    # batcher per job worker on top of the web process's own
+    Config.INFERENCE_WORKERS = 0
+    Config.INFERENCE_BATCHING = False
+
+    # Before torch is imported (sharded mode's processes inherit the nice value)
+    _lower_priority()
+
+    store = JobStore(db_path)
+    current = {"job_id": None}
+
+    threading.Thread(
+        target=_heartbeat,
+        args=(store, current, Config.VIDEO_JOB_HEARTBEAT_SECONDS, parent_pid),
+        name="video-job-heartbeat",
+        daemon=True
+    ).start()
+
+    while os.getppid() == parent_pid:
+        job = store.claim(os.getpid())
+
+        if job is None:
+            requeued = store.requeue_stale(Config.VIDEO_JOB_STALE_SECONDS)
+            if requeued:
+                logger.info(f"Requeued {requeued} video job(s) whose worker stopped")
+                continue
+
+            time.sleep(poll_interval)
+            continue
+
+        current["job_id"] = job["id"]
+        try:
+            _run_job(store, job)
+        finally:
+            current["job_id"] = None
+
+
+# =====================================================
+# WORKER MANAGER (WEB PROCESS)
+# =====================================================
+_store = None
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def get_job_store(config):
+    global _store
+
+    if _store is None:
+        _store = JobStore(config["VIDEO_JOB_DB"])
+
+    return _store
+
+
+def ensure_video_workers(config):
+    """
+    Start the job worker processes once per web process. Dead workers are
+    replaced; their jobs are requeued by the other workers once their
+    heartbeat goes stale (VIDEO_JOB_STALE_SECONDS).
+    """
+    count = config.get("VIDEO_JOB_WORKERS", 1)
+
+    if count <= 0:
+        return
+
+    with _workers_lock:
+        alive = [p for p in _workers if p.is_alive()]
+
+        if len(alive) >= count:
+            return
+
+        store = get_job_store(config)
+
+        # Spawn: workers load their own model and torch state
+        ctx = mp.get_context("spawn")
+
+        for i in range(count - len(alive)):
+            p = ctx.Process(
+                target=_worker_main,
+                args=(store.db_path, config.get("VIDEO_JOB_POLL_SECONDS", 1.0)),
+                name=f"video-job-worker-{len(_workers) + i}",
+                # Not daemonic: sharded mode starts its own process pool.
+                # Stopped by _stop_workers() at exit
+                daemon=False
+            )
+            p.start()
+            alive.append(p)
+
+        _workers[:] = alive
+
+
+def submit_video_job(config, owner_id, video_path, meta=None):
+    """Queue a saved video for analysis and make sure workers are running."""
+    job_id = get_job_store(config).create(owner_id, video_path, meta)
+    ensure_video_workers(config)
+    return job_id
+
+
+@atexit.register
+def _stop_workers():
+    for p in _workers:
+        if p.is_alive():
+            p.terminate()
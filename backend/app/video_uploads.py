@@ -0,0 +1,279 @@
+import os
+import time
+import uuid
+import base64
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_ALGORITHMS = ("sha256", "sha1", "md5")
+
+# Read size for streaming a chunk body to disk (bounds memory per upload)
+COPY_BUFFER = 64 * 1024
+
+
+class UploadError(Exception):
+    """Rejected chunk / upload. `status` is the HTTP status to answer with."""
+
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+
+# =====================================================
+# SQLITE UPLOAD TABLE
+# =====================================================
+class UploadStore:
+    """
+    Resumable video uploads (tus-like): each upload has a declared length
+    and a committed offset. Chunks are appended to a `.part` file next to
+    the final video and the offset only advances once a chunk's checksum
+    has been verified, so a retry resends exactly the missing bytes.
+
+    Lives in the video job database; every call opens its own connection.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_uploads (
+                    id TEXT PRIMARY KEY,
+                    owner_id TEXT NOT NULL,
+                    video_path TEXT NOT NULL,
+                    length INTEGER NOT NULL,
+                    offset_bytes INTEGER NOT NULL DEFAULT 0,
+                    meta TEXT,
+                    status TEXT NOT NULL DEFAULT 'open',
+                    job_id TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, owner_id, video_path, length, meta_json):
+        upload_id = uuid.uuid4().hex
+        now = time.time()
+
+        # Reserve the part file up front so chunks can always open it r+b
+        open(part_path(video_path), "wb").close()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO video_uploads (id, owner_id, video_path, length, meta, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (upload_id, str(owner_id), video_path, int(length), meta_json, now, now)
+            )
+
+        return upload_id
+
+    def get(self, upload_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM video_uploads WHERE id = ?", (upload_id,)).fetchone()
+
+        return dict(row) if row else None
+
+    def advance(self, upload_id, old_offset, new_offset):
+        """Compare-and-set the committed offset. False if another chunk won."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE video_uploads SET offset_bytes = ?, updated_at = ? "
+                "WHERE id = ? AND offset_bytes = ? AND status = 'open'",
+                (new_offset, time.time(), upload_id, old_offset)
+            )
+
+        return cur.rowcount == 1
+
+    def begin_finalize(self, upload_id):
+        """Claim a complete upload for finalisation. False if not complete or already claimed."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE video_uploads SET status = 'finalizing', updated_at = ? "
+                "WHERE id = ? AND status = 'open' AND offset_bytes = length",
+                (time.time(), upload_id)
+            )
+
+        return cur.rowcount == 1
+
+    def mark_finalized(self, upload_id, job_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE video_uploads SET status = 'finalized', job_id = ?, updated_at = ? "
+                "WHERE id = ?",
+                (job_id, time.time(), upload_id)
+            )
+
+    def delete(self, upload_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM video_uploads WHERE id = ?", (upload_id,))
+
+    def expire(self, max_age_seconds):
+        """Drop open uploads idle for longer than `max_age_seconds` (and their part files)."""
+        cutoff = time.time() - max_age_seconds
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, video_path FROM video_uploads WHERE status = 'open' AND updated_at < ?",
+                (cutoff,)
+            ).fetchall()
+
+            conn.execute(
+                "DELETE FROM video_uploads WHERE status = 'open' AND updated_at < ?",
+                (cutoff,)
+            )
+
+        for row in rows:
+            remove_part(row["video_path"])
+
+        return len(rows)
+
+
+def part_path(video_path):
+    return video_path + ".part"
+
+
+def remove_part(video_path):
+    try:
+        os.remove(part_path(video_path))
+    except OSError:
+        pass
+
+
+_local_chunk_lock = threading.Lock()
+
+
+@contextmanager
+def _exclusive(f):
+    """
+    Exclusive lock on an open part file, held across processes (gunicorn
+    workers) for a chunk's whole truncate → write → verify → commit.
+    """
+    if fcntl is None:
+        with _local_chunk_lock:
+            yield
+        return
+
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        # Buffered bytes must reach the file before the next holder reads the size
+        f.flush()
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def parse_checksum(header):
+    """tus `Upload-Checksum: <algorithm> <base64 digest>` -> (hasher, digest bytes)."""
+    try:
+        algorithm, encoded = header.strip().split(" ", 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except (AttributeError, ValueError):
+        raise UploadError("Upload-Checksum must be '<algorithm> <base64 digest>'")
+
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError(f"Unsupported checksum algorithm. Allowed: {', '.join(CHECKSUM_ALGORITHMS)}")
+
+    return hashlib.new(algorithm), digest
+
+
+# =====================================================
+# CHUNK WRITE
+# =====================================================
+def write_chunk(store, upload, offset, stream, checksum_header, max_chunk):
+    """
+    Stream one chunk from `stream` into the part file at `offset`.
+
+    The body is copied in COPY_BUFFER pieces while being hashed; it is
+    only committed (offset advanced) if the checksum matches. On any
+    failure the part file is truncated back to the committed offset, so
+    a partially received chunk never counts. Concurrent chunks for the
+    same upload are serialised on a file lock; the loser sees the new
+    offset and gets 409 without touching the file. Returns the new offset.
+    """
+    if upload["status"] != "open":
+        raise UploadError("Upload already finalized", 409)
+
+    hasher, expected = parse_checksum(checksum_header)
+
+    with open(part_path(upload["video_path"]), "r+b") as f, _exclusive(f):
+        # Re-read under the lock: another request may have committed meanwhile
+        upload = store.get(upload["id"])
+
+        if upload is None:
+            raise UploadError("Upload not found", 404)
+
+        if upload["status"] != "open":
+            raise UploadError("Upload already finalized", 409)
+
+        if offset != upload["offset_bytes"]:
+            raise UploadError("Offset mismatch", 409)
+
+        limit = min(max_chunk, upload["length"] - offset)
+        received = 0
+
+        f.truncate(offset)
+        f.seek(offset)
+
+        try:
+            while True:
+                piece = stream.read(COPY_BUFFER)
+                if not piece:
+                    break
+
+                received += len(piece)
+                if received > limit:
+                    raise UploadError("Chunk exceeds the chunk size limit or the declared upload length", 413)
+
+                hasher.update(piece)
+                f.write(piece)
+
+            if hasher.digest() != expected:
+                # tus "460 Checksum Mismatch"
+                raise UploadError("Checksum mismatch", 460)
+
+        except BaseException:
+            f.truncate(offset)
+            raise
+
+        new_offset = offset + received
+
+        if not store.advance(upload["id"], offset, new_offset):
+            f.truncate(offset)
+            raise UploadError("Offset mismatch", 409)
+
+    return new_offset
+
+
+_store = None
+
+
+def get_upload_store(config):
+    global _store
+
+    if _store is None:
+        _store = UploadStore(config["VIDEO_JOB_DB"])
+
+    return _store
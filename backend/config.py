@@ -43,6 +43,179 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
 
+    # =====================================================
+    # INFERENCE
+    # =====================================================
+    # Micro-batching: concurrent frames are grouped into one forward pass
+    INFERENCE_BATCHING = os.environ.get('INFERENCE_BATCHING', '1') == '1'
+    INFERENCE_BATCH_MAX_SIZE = int(os.environ.get('INFERENCE_BATCH_MAX_SIZE', 8))
+    INFERENCE_BATCH_MAX_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_MAX_WAIT_MS', 10))
+
+    # Queued inference is served realtime > interactive > batch; waiting
+    # work is promoted one class per this many seconds so batch still runs
+    INFERENCE_PRIORITY_AGING_SECONDS = float(os.environ.get('INFERENCE_PRIORITY_AGING_SECONDS', 2))
+
+    # torch / ultralytics are imported on the first inference, so auth,
+    # listing and file workers never load them. Inference workers can
+    # set this to load the model at start-up instead
+    INFERENCE_PRELOAD = os.environ.get('INFERENCE_PRELOAD', '0') == '1'
+
+    # Serving processes poll the active weights file (model/best.pt) and
+    # hot-swap a replaced file once it is warm (0 = off). Exports of the
+    # new file are serialised on a lock file, so only one worker rebuilds
+    # the ONNX / OpenVINO artifact.
+    # Reloading by name (/api/official/model/reload) publishes the file
+    # in model/ACTIVE, which every watcher follows.
+    # The watcher starts in create_app() (MODEL_WATCH_ON_START) or, under
+    # gunicorn, in each forked worker; never in the master, video job or
+    # shard processes
+    MODEL_WATCH_SECONDS = float(os.environ.get('MODEL_WATCH_SECONDS', 10))
+    MODEL_WATCH_ON_START = os.environ.get('MODEL_WATCH_ON_START', '1') == '1'
+
+    # Image sizes the model is warmed at when it loads (dashcam / citizen)
+    INFERENCE_WARMUP_SIZES = tuple(
+        int(x) for x in os.environ.get('INFERENCE_WARMUP_SIZES', '320,640').split(',') if x.strip()
+    )
+
+    # CPU backend: pytorch | onnxruntime | openvino
+    # Exported artifacts are cached next to model/best.pt
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'pytorch')
+    INFERENCE_INT8 = os.environ.get('INFERENCE_INT8', '1') == '1'
+
+    # INT8 static quantization is calibrated on already uploaded images
+    INFERENCE_CALIBRATION_DIR = os.path.join(UPLOAD_FOLDER, 'images')
+    INFERENCE_CALIBRATION_SAMPLES = int(os.environ.get('INFERENCE_CALIBRATION_SAMPLES', 100))
+    INFERENCE_CALIBRATION_IMGSZ = int(os.environ.get('INFERENCE_CALIBRATION_IMGSZ', 320))
+
+    # Dedicated inference processes (0 = run the model in the web process)
+    # Frames are handed over through a shared-memory ring of fixed slots
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+    INFERENCE_RING_SLOTS = int(os.environ.get('INFERENCE_RING_SLOTS', 0)) or None
+    INFERENCE_SLOT_BYTES = int(os.environ.get('INFERENCE_SLOT_BYTES', 1280 * 1280 * 3))
+
+    # CPU layout per inference process (app/cpu_topology.py): physical
+    # cores are split between workers, each pinned to its share, with one
+    # intra-op thread per physical core (per logical CPU with SMT on)
+    INFERENCE_PIN_CPUS = os.environ.get('INFERENCE_PIN_CPUS', '1') == '1'
+    INFERENCE_USE_SMT = os.environ.get('INFERENCE_USE_SMT', '0') == '1'
+    INFERENCE_INTEROP_THREADS = int(os.environ.get('INFERENCE_INTEROP_THREADS', 1))
+    INFERENCE_CV2_THREADS = int(os.environ.get('INFERENCE_CV2_THREADS', 1))  # per request thread
+
+    # Near-duplicate dashcam frames reuse a recent result (perceptual hash)
+    FRAME_CACHE_ENABLED = os.environ.get('FRAME_CACHE_ENABLED', '1') == '1'
+    FRAME_CACHE_TTL_SECONDS = float(os.environ.get('FRAME_CACHE_TTL_SECONDS', 3))
+    FRAME_CACHE_MAX_DISTANCE = int(os.environ.get('FRAME_CACHE_MAX_DISTANCE', 5))  # bits of 64
+    FRAME_CACHE_SIZE = int(os.environ.get('FRAME_CACHE_SIZE', 16))  # hashes per device
+
+    # Dashcam frames are only analysed on scene change, movement or refresh
+    MOTION_GATE_ENABLED = os.environ.get('MOTION_GATE_ENABLED', '1') == '1'
+    MOTION_GATE_SCENE_THRESHOLD = float(os.environ.get('MOTION_GATE_SCENE_THRESHOLD', 12))  # mean abs diff, 0-255
+    MOTION_GATE_MIN_DISTANCE_M = float(os.environ.get('MOTION_GATE_MIN_DISTANCE_M', 8))
+    MOTION_GATE_REFRESH_SECONDS = float(os.environ.get('MOTION_GATE_REFRESH_SECONDS', 5))
+
+    # Frame quality gate: unusable realtime frames never reach the model
+    QUALITY_GATE_ENABLED = os.environ.get('QUALITY_GATE_ENABLED', '1') == '1'
+    QUALITY_THUMB_WIDTH = 160
+    QUALITY_MIN_SHARPNESS = float(os.environ.get('QUALITY_MIN_SHARPNESS', 60))  # Laplacian variance
+    QUALITY_MIN_CONTRAST = float(os.environ.get('QUALITY_MIN_CONTRAST', 10))  # gray std-dev
+    QUALITY_DARK_LEVEL = 25
+    QUALITY_MAX_DARK_FRACTION = float(os.environ.get('QUALITY_MAX_DARK_FRACTION', 0.8))
+    QUALITY_BRIGHT_LEVEL = 250
+    QUALITY_MAX_BRIGHT_FRACTION = float(os.environ.get('QUALITY_MAX_BRIGHT_FRACTION', 0.35))
+
+    # Two-stage cascade: a tiny gate model screens frames, only positives
+    # reach best.pt. Enabled per endpoint: dashcam, citizen_frame
+    CASCADE_ENDPOINTS = [
+        e.strip() for e in os.environ.get('CASCADE_ENDPOINTS', '').split(',') if e.strip()
+    ]
+    CASCADE_GATE_MODEL = os.environ.get(
+        'CASCADE_GATE_MODEL',
+        os.path.join(os.path.dirname(BASE_DIR), 'model', 'gate.pt')
+    )
+    CASCADE_GATE_IMGSZ = int(os.environ.get('CASCADE_GATE_IMGSZ', 224))
+    CASCADE_GATE_THRESHOLD = float(os.environ.get('CASCADE_GATE_THRESHOLD', 0.2))
+    CASCADE_NEGATIVE_CLASSES = {'no_damage', 'no damage', 'negative', 'background', 'normal'}
+
+    # Realtime response payload: "image" (annotated base64 JPEG) or
+    # "boxes" (normalised box JSON, client draws the overlay).
+    # Clients can override per request with ?mode=
+    RESPONSE_MODE_DEFAULT = os.environ.get('RESPONSE_MODE_DEFAULT', 'image')
+
+    # Admission control: detect endpoints answer 429 + Retry-After instead
+    # of queueing without bound. Token bucket per device / user, a cap on
+    # in-flight requests, and a p95 latency ceiling over a sliding window
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+    ADMISSION_RATE_PER_SECOND = float(os.environ.get('ADMISSION_RATE_PER_SECOND', 5))  # dashcam loop runs up to ~5 FPS
+    ADMISSION_BURST = int(os.environ.get('ADMISSION_BURST', 10))
+    ADMISSION_MAX_INFLIGHT = int(os.environ.get('ADMISSION_MAX_INFLIGHT', 16))
+    ADMISSION_P95_LIMIT_MS = float(os.environ.get('ADMISSION_P95_LIMIT_MS', 1500))
+    ADMISSION_LATENCY_WINDOW_SECONDS = float(os.environ.get('ADMISSION_LATENCY_WINDOW_SECONDS', 10))
+
+    # Prometheus scrape endpoint (/metrics). Per-stage request latency,
+    # model forward time, batch sizes and queue / gate counters of this
+    # process. Set METRICS_TOKEN to require "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Dashcam WebSocket stream: server-side session aggregation
+    DASHCAM_STREAM_REPORT_INTERVAL = float(os.environ.get('DASHCAM_STREAM_REPORT_INTERVAL', 30))
+    DASHCAM_STREAM_IDLE_TIMEOUT = float(os.environ.get('DASHCAM_STREAM_IDLE_TIMEOUT', 60))
+
+    # Concurrent streams per process. Each holds a server thread for the
+    # whole drive; extra connections are refused (close code 1013) so
+    # streams can't take the threads HTTP needs (see gunicorn.conf.py)
+    DASHCAM_STREAM_MAX = int(os.environ.get('DASHCAM_STREAM_MAX', 8))
+    # Per device token (a reconnect may overlap the old socket's idle timeout)
+    DASHCAM_STREAM_MAX_PER_DEVICE = int(os.environ.get('DASHCAM_STREAM_MAX_PER_DEVICE', 2))
+
+    # =====================================================
+    # VIDEO ANALYSIS JOBS
+    # =====================================================
+    # Background job table (plain SQLite, shared with the worker processes)
+    VIDEO_JOB_DB = os.environ.get('VIDEO_JOB_DB', os.path.join(BASE_DIR, 'video_jobs.db'))
+    VIDEO_JOB_WORKERS = int(os.environ.get('VIDEO_JOB_WORKERS', 1))
+    VIDEO_JOB_POLL_SECONDS = float(os.environ.get('VIDEO_JOB_POLL_SECONDS', 1))
+
+    # Every web process (gunicorn worker) runs its own job workers against
+    # the shared table. A running job is owned by one worker pid that
+    # heartbeats it; only jobs whose heartbeat is older than STALE are
+    # requeued (crashed / killed owner)
+    VIDEO_JOB_HEARTBEAT_SECONDS = float(os.environ.get('VIDEO_JOB_HEARTBEAT_SECONDS', 10))
+    VIDEO_JOB_STALE_SECONDS = float(os.environ.get('VIDEO_JOB_STALE_SECONDS', 60))
+
+    # Job workers hold their own model copy, outside the realtime priority
+    # queue: they run niced, with a reduced thread budget
+    # (0 = half of the cores the process may use)
+    VIDEO_JOB_NICE = int(os.environ.get('VIDEO_JOB_NICE', 10))
+    VIDEO_JOB_THREADS = int(os.environ.get('VIDEO_JOB_THREADS', 0))
+    VIDEO_ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
+
+    # "keyframe": detector on every Nth frame or on scene change, others
+    # skipped undecoded, damages counted once via an IoU tracker.
+    # "full": every frame through the model, one process
+    VIDEO_ANALYSIS_MODE = os.environ.get('VIDEO_ANALYSIS_MODE', 'keyframe')
+    VIDEO_KEYFRAME_STRIDE = int(os.environ.get('VIDEO_KEYFRAME_STRIDE', 10))
+    VIDEO_SCENE_PROBE_STRIDE = int(os.environ.get('VIDEO_SCENE_PROBE_STRIDE', 3))
+    VIDEO_SCENE_THRESHOLD = float(os.environ.get('VIDEO_SCENE_THRESHOLD', 18))  # mean abs diff, 0-255
+    VIDEO_TRACK_IOU = float(os.environ.get('VIDEO_TRACK_IOU', 0.3))
+    VIDEO_TRACK_MAX_MISSED = int(os.environ.get('VIDEO_TRACK_MAX_MISSED', 3))  # keyframes
+
+    # "sharded": every frame, split into time segments across processes
+    # (each with its own model). 0 workers = one per core of the job
+    # worker's thread budget (affinity, cgroup quota and VIDEO_JOB_THREADS aware)
+    VIDEO_SHARD_WORKERS = int(os.environ.get('VIDEO_SHARD_WORKERS', 0))
+    VIDEO_SHARDS_PER_WORKER = int(os.environ.get('VIDEO_SHARDS_PER_WORKER', 4))
+
+    # Per-frame timeline streamed next to the video as NDJSON
+    # (<video>.timeline.ndjson) instead of being kept in the job result
+    VIDEO_TIMELINE_ENABLED = os.environ.get('VIDEO_TIMELINE_ENABLED', '1') == '1'
+
+    # Resumable chunked uploads (/api/video/uploads). Each PATCH body is
+    # streamed to disk, so chunks stay well under MAX_CONTENT_LENGTH
+    VIDEO_UPLOAD_MAX_LENGTH = int(os.environ.get('VIDEO_UPLOAD_MAX_LENGTH', 4 * 1024 * 1024 * 1024))
+    VIDEO_UPLOAD_CHUNK_MAX = int(os.environ.get('VIDEO_UPLOAD_CHUNK_MAX', 8 * 1024 * 1024))
+    VIDEO_UPLOAD_EXPIRY_HOURS = float(os.environ.get('VIDEO_UPLOAD_EXPIRY_HOURS', 24))
+
     # Create upload directories automatically (DEV SAFE)
     try:
         os.makedirs(os.path.join(UPLOAD_FOLDER, 'images'), exist_ok=True)
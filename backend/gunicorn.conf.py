@@ -0,0 +1,71 @@
+import os
+import sys
+
+# =====================================================
+# PRE-FORK PRODUCTION SERVER
+# =====================================================
+#   cd backend
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app (and the YOLO model, warmed at INFERENCE_WARMUP_SIZES) is loaded
+# once in the master and shared copy-on-write by the forked workers.
+# CPU serving only: on a GPU host run GUNICORN_WORKERS=1, since a CUDA
+# context can't be shared across fork.
+
+cpu_count = os.cpu_count() or 1
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", max(1, min(4, cpu_count // 2))))
+
+# Request threads per worker: they mostly wait on the (batched) model,
+# so a few are enough to keep the micro-batcher fed. Every connected
+# /api/dashcam/stream WebSocket holds one thread for the whole drive.
+# The app refuses streams beyond DASHCAM_STREAM_MAX per worker, so the
+# GUNICORN_THREADS threads on top of those always remain for HTTP,
+# /readyz and /metrics
+worker_class = "gthread"
+stream_threads = int(os.environ.setdefault(
+    "DASHCAM_STREAM_MAX",
+    os.environ.get("GUNICORN_STREAMS", "8")
+))
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) + stream_threads
+
+# Model loaded before fork (see wsgi.py)
+preload_app = True
+os.environ.setdefault("INFERENCE_PRELOAD", "1")
+
+# The weights watcher runs in the workers (post_fork), not the master
+os.environ.setdefault("MODEL_WATCH_ON_START", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import cpu_topology  # noqa: E402
+
+# Warm-up runs in the master single-threaded: no intra-op thread pool
+# exists at fork time, each worker builds its own in post_fork
+cpu_topology.apply_layout(dict(cpu_topology.plan_layout(1)[0], threads=1), pin=False)
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+# %(U)s is the path without the query string: the stream URL carries
+# the device JWT as ?token=
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(a)s" %(L)ss'
+
+
+def pre_fork(server, worker):
+    # Stable slot per worker (a restarted worker takes over the free slot),
+    # so each slot keeps its cores / NUMA node
+    taken = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(i for i in range(workers + 1) if i not in taken)
+
+
+def post_fork(server, worker):
+    # Pins the worker to its share of physical cores and sizes torch /
+    # OpenCV (and a later ONNX Runtime session) to it
+    cpu_topology.apply_worker_layout(worker.cpu_slot, workers)
+
+    from app import ml_utils
+    ml_utils.start_model_watcher()
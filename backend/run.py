@@ -1,5 +1,5 @@
 from app import create_app, db
-from app.models import User, DamageReport, WorkReport
+from app.models import User, DamageReport, WorkReport, upgrade_schema
 
 app = create_app()
 
@@ -8,6 +8,7 @@ if __name__ == '__main__':
         try:
             print("Initializing database...")
             db.create_all()
+            upgrade_schema()
             print("Database initialized successfully.")
         except Exception as e:
             print(f"Error initializing database: {e}")
@@ -0,0 +1,15 @@
+import gc
+from app import create_app
+
+# Production entry point (see gunicorn.conf.py). With preload_app the
+# model is loaded and warmed here, in the master, before workers fork.
+app = create_app()
+
+# New columns on existing report tables (run.py does this for the dev server)
+with app.app_context():
+    from app.models import upgrade_schema
+    upgrade_schema()
+
+# Move everything loaded so far out of the GC's generations: collections
+# in the workers then don't touch (and copy) the shared pages
+gc.freeze()
@@ -144,10 +144,11 @@ async function startRealtime(facingMode) {
 }
 
 let rtRequestInFlight = false;
+let rtPausedUntil = 0;  // set from the server's 429 suggested interval
 
 async function sendRealtimeFrame() {
 
-    if (!rtIsRunning || rtRequestInFlight) return;
+    if (!rtIsRunning || rtRequestInFlight || Date.now() < rtPausedUntil) return;
 
     const video = document.getElementById('webcamVideo');
 
@@ -159,26 +160,42 @@ async function sendRealtimeFrame() {
 
         rtCtx.drawImage(video, 0, 0, rtCanvas.width, rtCanvas.height);
 
-        const frameData = rtCanvas.toDataURL('image/jpeg', 0.6);
+        // Raw JPEG body (no base64 / JSON envelope)
+        const frameBlob = await new Promise((resolve, reject) => {
+            rtCanvas.toBlob(
+                blob => blob ? resolve(blob) : reject(new Error("Frame encode failed")),
+                'image/jpeg',
+                0.6
+            );
+        });
 
         rtFramesSent++;
         document.getElementById('rtFrames').textContent = rtFramesSent;
 
-        const res = await fetch("/api/citizen/detect-frame", {
+        // Boxes-only response: the overlay is drawn here, not on the server
+        const res = await fetch("/api/citizen/detect-frame?mode=boxes", {
             method: "POST",
             headers: {
                 "Authorization": `Bearer ${Auth.getToken()}`,
-                "Content-Type": "application/json"
+                "Content-Type": "image/jpeg"
             },
-            body: JSON.stringify({
-                frame: frameData
-            })
+            body: frameBlob
         });
 
         const data = await res.json();
 
+        // Server shed this frame: skip ticks until the suggested interval passes
+        if (res.status === 429) {
+            rtPausedUntil = Date.now() + (data.suggested_interval_ms || 1000);
+            return;
+        }
+
         if (!res.ok) return;
 
+        if (data.detected && data.boxes) {
+            data.annotated_image = drawDetectionBoxes(rtCanvas, data.boxes);
+        }
+
         updateRealtimeOverlay(data);
 
         if (data.detected) {
@@ -188,9 +205,9 @@ async function sendRealtimeFrame() {
 
     } catch (err) {
         console.warn("Realtime error:", err);
+    } finally {
+        rtRequestInFlight = false;
     }
-
-    rtRequestInFlight = false;
 }
 
 // Stores last realtime detection for manual submit
@@ -223,6 +240,8 @@ function updateRealtimeOverlay(data) {
         submitBtn.textContent = '📤 Submit Report';
         submitStatus.style.display = 'none';
         document.getElementById('rtLastDetectionCard').style.display = 'block';
+    } else if (data.damage_type === 'Low Quality') {
+        overlay.innerHTML = `<span class="detection-label no-damage">⚠ Low quality (${(data.quality_reasons || []).join(', ')})</span>`;
     } else {
         overlay.innerHTML = `<span class="detection-label no-damage">✓ No Damage</span>`;
     }
@@ -443,6 +462,9 @@ async function submitRealtimeReport() {
     if (rtLastDetection.annotated_image) {
         formData.append('frame_b64', rtLastDetection.annotated_image);
     }
+    if (rtLastDetection.model_version) {
+        formData.append('model_version', rtLastDetection.model_version);
+    }
 
     try {
         const res = await fetch('/api/citizen/submit-realtime-frame', {
@@ -9,7 +9,7 @@ let detectionResult = null;
 let annotatedImageB64 = null;  // stores base64 annotated image from /detect
 
 // Shared GPS state — acquired once, used by all tabs
-let gpsData = { lat: null, lng: null, locationText: 'Acquiring location...' };
+let gpsData = { lat: null, lng: null, speed: null, locationText: 'Acquiring location...' };
 
 // =====================================================
 // INIT
@@ -65,9 +65,10 @@ function initReportForm() {
     setAllLocationDisplays('Acquiring GPS...');
 
     const handlePosition = (position) => {
-        const { latitude, longitude } = position.coords;
+        const { latitude, longitude, speed } = position.coords;
         gpsData.lat = latitude;
         gpsData.lng = longitude;
+        gpsData.speed = speed;  // m/s, null when unknown
         gpsData.locationText = `Lat: ${latitude.toFixed(5)}, Lng: ${longitude.toFixed(5)}`;
         setAllLocationDisplays(gpsData.locationText);
     };
@@ -113,6 +114,7 @@ let rtCurrentFacingMode = 'environment'; // 'environment' = back, 'user' = front
 let rtDynamicDelay = 300;     // starting delay (~3 FPS)
 const rtMinDelay = 200;       // max speed (~5 FPS)
 const rtMaxDelay = 900;       // slowest (~1 FPS)
+let rtServerBackoff = 0;      // server-requested interval after a 429 / throttle
 
 // 4 seconds cool down period
 // 4 seconds cool down period
@@ -199,10 +201,93 @@ async function startRealtime(facingMode) {
 
         rtCtx = rtCanvas.getContext('2d');
 
+        openDashcamStream();
         startRealtimeLoop(); // start adaptive loop
     };
 }
 
+// =====================================================
+// STREAMING CHANNEL (one WebSocket per drive)
+// =====================================================
+let rtSocket = null;
+let rtSocketPending = null;   // resolves the frame currently in flight
+
+function openDashcamStream() {
+    if (!('WebSocket' in window) || rtSocket) return;
+
+    const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(
+        `${proto}://${location.host}/api/dashcam/stream?mode=boxes&token=${encodeURIComponent(Auth.getToken())}`
+    );
+
+    ws.onopen = () => {
+        rtSocket = ws;
+        sendStreamGps();
+    };
+
+    ws.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+
+        if (msg.type === 'report_saved') {
+            showToast(`Dashcam report saved (${msg.valid_detections} detections)`);
+            return;
+        }
+
+        if (rtSocketPending) {
+            const resolve = rtSocketPending;
+            rtSocketPending = null;
+            resolve(msg);
+        }
+    };
+
+    // Falls back to HTTP POST per frame
+    ws.onclose = () => {
+        rtSocket = null;
+        if (rtSocketPending) {
+            rtSocketPending(null);
+            rtSocketPending = null;
+        }
+    };
+}
+
+function sendStreamGps() {
+    if (!rtSocket) return;
+
+    rtSocket.send(JSON.stringify({
+        type: 'gps',
+        latitude: gpsData.lat,
+        longitude: gpsData.lng,
+        speed: gpsData.speed,
+        location: gpsData.locationText
+    }));
+}
+
+function streamFrame(blob) {
+    return new Promise(resolve => {
+        rtSocketPending = resolve;
+        rtSocket.send(blob);
+    });
+}
+
+function closeDashcamStream() {
+    if (!rtSocket) return;
+
+    // Server saves the pending session report on close
+    rtSocket.send(JSON.stringify({ type: 'end' }));
+    rtSocket.close();
+    rtSocket = null;
+}
+
+function canvasToJpegBlob(canvas, quality) {
+    return new Promise((resolve, reject) => {
+        canvas.toBlob(
+            blob => blob ? resolve(blob) : reject(new Error("Frame encode failed")),
+            'image/jpeg',
+            quality
+        );
+    });
+}
+
 async function sendRealtimeFrame() {
 
     if (!rtIsRunning) return;
@@ -219,33 +304,82 @@ async function sendRealtimeFrame() {
 
     // Capture frame
     rtCtx.drawImage(video, 0, 0, rtCanvas.width, rtCanvas.height);
-    const frameData = rtCanvas.toDataURL('image/jpeg', 0.5);
 
     rtFramesSent++;
     document.getElementById('rtFrames').textContent = rtFramesSent;
 
     try {
 
-        const res = await fetch("/api/dashcam/detect-frame", {
-            method: "POST",
-            headers: {
+        // Raw JPEG body (no base64); GPS travels in headers
+        const frameBlob = await canvasToJpegBlob(rtCanvas, 0.5);
+
+        // Streaming channel: the server aggregates the session itself
+        const streaming = rtSocket && rtSocket.readyState === WebSocket.OPEN;
+
+        let data;
+
+        if (streaming) {
+
+            sendStreamGps();
+            data = await streamFrame(frameBlob);
+
+            // Server shed this frame: wait as long as it asks
+            if (data && data.type === 'throttled') {
+                rtServerBackoff = data.suggested_interval_ms || rtMaxDelay;
+                return;
+            }
+
+            if (!data || data.type !== 'result') return;
+
+        } else {
+
+            const headers = {
                 "Authorization": `Bearer ${Auth.getToken()}`,
-                "Content-Type": "application/json"
-            },
-            body: JSON.stringify({
-                frame: frameData,
-                location: gpsData.locationText,
-                latitude: gpsData.lat,
-                longitude: gpsData.lng
-            })
-        });
+                "Content-Type": "image/jpeg",
+                "X-Location": encodeURIComponent(gpsData.locationText)
+            };
+            if (gpsData.lat != null) headers["X-Latitude"] = gpsData.lat;
+            if (gpsData.lng != null) headers["X-Longitude"] = gpsData.lng;
+            if (gpsData.speed != null) headers["X-Speed"] = gpsData.speed;
+
+            // Boxes-only response: the overlay is drawn here, not on the server
+            const res = await fetch("/api/dashcam/detect-frame?mode=boxes", {
+                method: "POST",
+                headers,
+                body: frameBlob
+            });
+
+            data = await res.json();
+
+            // Server shed this frame: wait as long as it asks
+            if (res.status === 429) {
+                rtServerBackoff = data.suggested_interval_ms
+                    || Number(res.headers.get('Retry-After')) * 1000
+                    || rtMaxDelay;
+                return;
+            }
 
-        const data = await res.json();
+            if (!res.ok) return;
+        }
 
-        if (!res.ok) return;
+        // Server skipped inference (vehicle idle, scene unchanged):
+        // keep the current overlay and don't count it again
+        if (data.skipped) return;
+
+        if (data.detected && data.boxes) {
+            data.annotated_image = drawDetectionBoxes(rtCanvas, data.boxes);
+        }
 
         updateRealtimeOverlay(data);
 
+        if (streaming) {
+            if (data.detected) {
+                rtTotalDetections++;
+                document.getElementById('rtTotal').textContent = rtTotalDetections;
+            }
+            return;
+        }
+
         // -------------------------------------------------
         // HANDLE DETECTION
         // -------------------------------------------------
@@ -284,7 +418,8 @@ async function sendRealtimeFrame() {
                         image: data.annotated_image,
                         lat: currentLat,
                         lng: currentLng,
-                        text: gpsData.locationText
+                        text: gpsData.locationText,
+                        model_version: data.model_version
                     },
                     last_damage: null,
                     intermediate_locations: [],
@@ -317,7 +452,8 @@ async function sendRealtimeFrame() {
                 image: data.annotated_image,
                 lat: currentLat,
                 lng: currentLng,
-                text: gpsData.locationText
+                text: gpsData.locationText,
+                model_version: data.model_version
             };
 
         }
@@ -388,6 +524,11 @@ function updateRealtimeOverlay(data) {
 
         document.getElementById('rtLastDetectionCard').style.display = 'block';
 
+    } else if (data.damage_type === 'Low Quality') {
+
+        overlay.innerHTML =
+            `<span class="detection-label no-damage">⚠ Low quality (${(data.quality_reasons || []).join(', ')})</span>`;
+
     } else {
 
         overlay.innerHTML =
@@ -427,6 +568,8 @@ async function submitDashcamSession(session) {
 function stopRealtime() {
     rtIsRunning = false;
 
+    closeDashcamStream();
+
     if (rtInterval) {
         clearInterval(rtInterval);
         rtInterval = null;
@@ -725,6 +868,15 @@ async function startRealtimeLoop() {
 
     const elapsed = performance.now() - start;
 
+    // Server back-pressure overrides the local heuristic
+    if (rtServerBackoff) {
+        const backoff = rtServerBackoff;
+        rtServerBackoff = 0;
+        rtDynamicDelay = rtMaxDelay;
+        setTimeout(startRealtimeLoop, Math.max(backoff, rtDynamicDelay));
+        return;
+    }
+
     // Adjust delay based on processing time
     if (elapsed > 600) {
         rtDynamicDelay = Math.min(rtDynamicDelay + 100, rtMaxDelay);
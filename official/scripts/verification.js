@@ -112,7 +112,13 @@ async function populateReport(report) {
 
     if (report.image_url && img) {
         try {
-            const response = await Auth.fetchWithAuth(report.image_url);
+            // Annotated copy is rendered on first view; fall back to the original
+            let response = report.annotated_url
+                ? await Auth.fetchWithAuth(report.annotated_url)
+                : null;
+            if (!response || !response.ok) {
+                response = await Auth.fetchWithAuth(report.image_url);
+            }
             if (response.ok) {
                 const blob = await response.blob();
                 img.src = URL.createObjectURL(blob);
@@ -0,0 +1,31 @@
+// Detection box overlay for Road Damage Detection System
+
+/**
+ * Draw normalised server boxes ({label, conf, box: [x1, y1, x2, y2]})
+ * onto a copy of the captured frame. Returns a JPEG data URL.
+ */
+function drawDetectionBoxes(sourceCanvas, boxes) {
+    const canvas = document.createElement('canvas');
+    canvas.width = sourceCanvas.width;
+    canvas.height = sourceCanvas.height;
+
+    const ctx = canvas.getContext('2d');
+    ctx.drawImage(sourceCanvas, 0, 0);
+    ctx.lineWidth = 2;
+    ctx.font = '14px sans-serif';
+
+    boxes.forEach(({ label, conf, box }) => {
+        const [x1, y1, x2, y2] = [
+            box[0] * canvas.width,
+            box[1] * canvas.height,
+            box[2] * canvas.width,
+            box[3] * canvas.height
+        ];
+        ctx.strokeStyle = '#ef4444';
+        ctx.fillStyle = '#ef4444';
+        ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+        ctx.fillText(`${label} ${conf.toFixed(2)}`, x1, Math.max(y1 - 5, 12));
+    });
+
+    return canvas.toDataURL('image/jpeg', 0.7);
+}